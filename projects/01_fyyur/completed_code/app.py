@@ -4,14 +4,33 @@
 
 import dateutil.parser
 import babel
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+from datetime import datetime, timedelta
+from collections import defaultdict
+from functools import lru_cache
+from itertools import groupby
+from flask import Flask, Response, render_template, request, jsonify, flash, redirect, url_for, abort, g, has_app_context, stream_with_context
+from flask import before_render_template, template_rendered
+from markupsafe import Markup
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+import click
+import hashlib
 import logging
+import time
 from logging import Formatter, FileHandler
 from forms import *
+from search import register_search_indexes, search
+from cache import Cache, cache_metrics
+from genres import genres_column, parse_genres_column
+from metrics import Metrics
+from pool import TimedQueuePool, engine_options, pool_metrics
+from importer import ImportStats, batched, read_rows, validate_row
+from exporter import EXPORT_FORMATS, write_rows
+from writes import Conflict, integrity_message, update, upsert
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -19,9 +38,99 @@ from forms import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+
+class Database(SQLAlchemy):
+  def apply_driver_hacks(self, app, sa_url, options):
+    # pool sizing applies to server databases, SQLite keeps Flask-SQLAlchemy's pools
+    sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+    if sa_url.get_backend_name() != 'sqlite':
+      options.update(engine_options(app.config, sa_url.get_backend_name()))
+    return sa_url, options
+
+db = Database(app)
 DEBUG = True
 migrate = Migrate(app, db)
+cache = Cache()
+cache.init_app(app)
+
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#----------------------------------------------------------------------------#
+
+# every request records its wall time, SQL statements, SQL time and template
+# render time: they are sent to the browser as a Server-Timing header (shown
+# in the devtools network panel), aggregated per endpoint at /metrics and
+# logged when slower than SLOW_REQUEST_THRESHOLD
+metrics = Metrics()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+  record_query(conn)
+
+@event.listens_for(Engine, 'handle_error')
+def stop_failed_query_timer(context):
+  # a failed statement never reaches after_cursor_execute
+  if context.connection is not None and context.connection.info.get('query_start'):
+    record_query(context.connection)
+
+def record_query(conn):
+  elapsed = time.perf_counter() - conn.info['query_start'].pop()
+  if has_app_context():
+    g.db_queries = g.get('db_queries', 0) + 1
+    g.db_time = g.get('db_time', 0) + elapsed
+
+def add_render_time(elapsed):
+  g.render_time = g.get('render_time', 0) + elapsed
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+  g.render_start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stop_render_timer(sender, template, context, **extra):
+  add_render_time(time.perf_counter() - g.pop('render_start'))
+
+@app.before_request
+def start_request_timer():
+  g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+  if 'request_start' not in g:
+    return response
+
+  duration = time.perf_counter() - g.request_start
+  db_queries, db_time, render_time = g.get('db_queries', 0), g.get('db_time', 0), g.get('render_time', 0)
+
+  response.headers['Server-Timing'] = 'db;dur={:.2f};desc="{} queries", render;dur={:.2f}, total;dur={:.2f}'.format(
+    db_time * 1000, db_queries, render_time * 1000, duration * 1000)
+  metrics.observe_request(request.endpoint or 'none', request.method, response.status_code,
+    duration, db_queries, db_time, render_time)
+
+  threshold = app.config.get('SLOW_REQUEST_THRESHOLD')
+  if threshold is not None and duration >= threshold:
+    app.logger.warning('Slow request: %s %s %s in %.0f ms, %d queries in %.0f ms, rendered in %.0f ms',
+      request.method, request.full_path.rstrip('?'), response.status_code,
+      duration * 1000, db_queries, db_time * 1000, render_time * 1000)
+  return response
+
+@metrics.collector
+def collect_pool_metrics():
+  pool = db.engine.pool
+  if isinstance(pool, TimedQueuePool):
+    yield from pool_metrics(pool)
+
+@metrics.collector
+def collect_cache_metrics():
+  yield from cache_metrics(cache)
+
+@app.route('/metrics')
+def metrics_endpoint():
+  return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 #----------------------------------------------------------------------------#
@@ -30,15 +139,45 @@ migrate = Migrate(app, db)
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    # venue/artist pages filter on the owner and split on start_time, /shows pages on (start_time, id)
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), primary_key=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), primary_key=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), primary_key=False, nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), primary_key=False, nullable=False)
     start_time = db.Column(db.DateTime(timezone=False), nullable=False)
 
 
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+# the primary keys lead with genre_id, so genre -> venues/artists is an index lookup
+venue_genres = db.Table('venue_genres',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True, index=True)
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True, index=True)
+)
+
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    # venues are listed and searched by area, the home page lists the most recently created
+    __table_args__ = (
+        db.Index('ix_Venue_state_city_name', 'state', 'city', 'name'),
+        db.Index('ix_Venue_created_at', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime(timezone=False), nullable=True, default=db.func.current_timestamp())
@@ -49,53 +188,545 @@ class Venue(db.Model):
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=True)
     seeking_talent = db.Column(db.Boolean, nullable=True, default=False)
-    seeking_description = db.Column(db.String(500))
-    website = db.Column(db.String(200))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
+    # only the venue page shows the profile, so it is loaded on demand (see PROFILE)
+    seeking_description = db.deferred(db.Column(db.String(500)), group='profile')
+    website = db.deferred(db.Column(db.String(200)), group='profile')
+    image_link = db.deferred(db.Column(db.String(500)), group='profile')
+    facebook_link = db.deferred(db.Column(db.String(120)), group='profile')
+    # maintained by count_shows and refresh_show_counts, see ShowCounts
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref=db.backref('venue', lazy=True))
+    genre_list = db.relationship('Genre', secondary=venue_genres, order_by=Genre.name)
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    # artists are listed by name or newest first, and filtered by area
+    __table_args__ = (
+        db.Index('ix_Artist_state_city_name', 'state', 'city', 'name'),
+        db.Index('ix_Artist_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    created_at = db.Column(db.DateTime(timezone=False), nullable=True, default=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime(timezone=False), nullable=False, default=db.func.current_timestamp())
     name = db.Column(db.String, nullable=False, unique=True)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=True)
     genres = db.Column(db.String(120), nullable=False)
     seeking_venue = db.Column(db.Boolean, nullable=True, default=False)
-    seeking_description = db.Column(db.String(500))
-    website = db.Column(db.String(200))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
+    # only the artist page shows the profile, so it is loaded on demand (see PROFILE)
+    seeking_description = db.deferred(db.Column(db.String(500)), group='profile')
+    website = db.deferred(db.Column(db.String(200)), group='profile')
+    image_link = db.deferred(db.Column(db.String(500)), group='profile')
+    facebook_link = db.deferred(db.Column(db.String(120)), group='profile')
+    # maintained by count_shows and refresh_show_counts, see ShowCounts
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref=db.backref('artist', lazy=True))
+    genre_list = db.relationship('Genre', secondary=artist_genres, order_by=Genre.name)
+
+
+class ShowCounts(db.Model):
+    __tablename__ = 'ShowCounts'
+    # a single row: the show counters of venues and artists count a show as
+    # upcoming when it starts after counted_until, which the refresh-show-counts
+    # command moves forward
+    id = db.Column(db.Integer, primary_key=True)
+    counted_until = db.Column(db.DateTime(timezone=False), nullable=False)
+
+
+@event.listens_for(ShowCounts.__table__, 'after_create')
+def insert_show_counts(target, connection, **kw):
+  # a new database has no shows, so every counter is right as of now
+  connection.execute(target.insert().values(id=1, counted_until=datetime.now()))
+
+
+class DataVersion(db.Model):
+    __tablename__ = 'DataVersion'
+    # one row each for venues, artists and shows, incremented in the transaction
+    # of every write to them; the API builds its ETags from these, so every
+    # process agrees on them
+    name = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+@event.listens_for(DataVersion.__table__, 'after_create')
+def insert_data_versions(target, connection, **kw):
+  connection.execute(target.insert(), [{'name': name, 'version': 0} for name in ('venue', 'artist', 'show')])
+
+
+register_search_indexes(Venue)
+register_search_indexes(Artist)
 
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+@lru_cache(maxsize=None)
+def get_datetime_formatter(format='medium', locale=None):
+  # compiles the Babel pattern and loads the locale once per (format, locale)
+  pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+  locale = babel.Locale.parse(locale or babel.dates.LC_TIME)
+  return lambda date: pattern.apply(date, locale)
+
+def format_datetime(value, format='medium', locale=None):
+  # datetime objects are formatted directly, strings are parsed first
+  if not isinstance(value, datetime):
+    value = dateutil.parser.parse(value)
+  return get_datetime_formatter(format, locale)(value)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+SHOWS_PER_PAGE = 30
+
+# only the most recent past shows are listed on venue and artist pages
+PAST_SHOWS_PER_PAGE = 12
+
+ARTISTS_PER_PAGE = 50
+MAX_ARTISTS_PER_PAGE = 200
+ARTIST_SORTS = ('name', 'created_at')
+
+def get_shows(criterion, related, related_id, *columns):
+  '''
+  get_shows(criterion, related, related_id, *columns)
+      returns (upcoming_shows, past_shows) for the shows matching criterion,
+      joined to the related model. The split into upcoming and past shows and
+      the ordering are done in SQL, so only the upcoming shows and one page of
+      past shows are loaded; the counts are kept on the venue or artist.
+  '''
+  current_time = datetime.now()
+
+  query = db.session.query(Show.start_time, *columns) \
+    .join(related, related_id == related.id) \
+    .filter(criterion)
+
+  upcoming_shows = query.filter(Show.start_time > current_time) \
+    .order_by(Show.start_time) \
+    .all()
+  past_shows = query.filter(Show.start_time <= current_time) \
+    .order_by(Show.start_time.desc()) \
+    .limit(PAST_SHOWS_PER_PAGE) \
+    .all()
+
+  return upcoming_shows, past_shows
+
+def get_venue_shows(venue_id):
+  return get_shows(Show.venue_id == venue_id, Artist, Show.artist_id,
+    Artist.id.label('artist_id'),
+    Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link'))
+
+def get_artist_shows(artist_id):
+  return get_shows(Show.artist_id == artist_id, Venue, Show.venue_id,
+    Venue.id.label('venue_id'),
+    Venue.name.label('venue_name'),
+    Venue.image_link.label('venue_image_link'))
+
+def get_conflicting_shows(venue_id, artist_id, start_time):
+  '''
+  get_conflicting_shows(venue_id, artist_id, start_time)
+      returns the shows at the venue or by the artist that overlap a show
+      starting at start_time
+  '''
+  # every show lasts SHOW_DURATION, so overlapping shows start less than one
+  # duration apart: two range scans on the (venue_id, start_time) and
+  # (artist_id, start_time) indexes, whatever the number of shows
+  duration = app.config['SHOW_DURATION']
+  window = db.and_(Show.start_time > start_time - duration, Show.start_time < start_time + duration)
+  columns = (Show.id, Show.venue_id, Show.artist_id, Show.start_time)
+
+  return db.session.query(*columns).filter(Show.venue_id == venue_id, window) \
+    .union(db.session.query(*columns).filter(Show.artist_id == artist_id, window)) \
+    .all()
+
+def get_free_slots(venue_id, start, end):
+  '''
+  get_free_slots(venue_id, start, end)
+      returns the (start, end) periods between start and end in which the
+      venue has no show and a show of SHOW_DURATION fits
+  '''
+  duration = app.config['SHOW_DURATION']
+  booked = db.session.query(Show.start_time) \
+    .filter(Show.venue_id == venue_id, Show.start_time > start - duration, Show.start_time < end) \
+    .order_by(Show.start_time)
+
+  slots = []
+  free_from = start
+  for show_start, in booked:
+    if show_start - free_from >= duration:
+      slots.append((free_from, show_start))
+    free_from = max(free_from, show_start + duration)
+  if end - free_from >= duration:
+    slots.append((free_from, end))
+  return slots
+
+EXPORT_BATCH_SIZE = 1000
+
+def get_export_rows(kind, start=None, end=None):
+  '''
+  get_export_rows(kind, start=None, end=None)
+      yields every venue, artist or show (those starting between start and
+      end) as a dict, streamed from a server-side cursor
+  '''
+  if kind == 'shows':
+    query = db.session.query(
+        Show.id, Show.start_time,
+        Show.venue_id, Venue.name.label('venue'),
+        Show.artist_id, Artist.name.label('artist')
+      ).join(Venue, Show.venue_id == Venue.id) \
+      .join(Artist, Show.artist_id == Artist.id)
+    if start:
+      query = query.filter(Show.start_time >= start)
+    if end:
+      query = query.filter(Show.start_time < end)
+    query = query.order_by(Show.start_time, Show.id)
+  else:
+    model = Venue if kind == 'venues' else Artist
+    query = db.session.query(*[column for column in model.__table__.columns]).order_by(model.id)
+
+  # psycopg2 streams with a named cursor, fetching EXPORT_BATCH_SIZE rows at a time
+  for row in query.execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE):
+    row = row._asdict()
+    if 'genres' in row:
+      row['genres'] = parse_genres_column(row['genres'])
+    yield row
+
+def get_export_columns(kind):
+  if kind == 'shows':
+    return ['id', 'start_time', 'venue_id', 'venue', 'artist_id', 'artist']
+  model = Venue if kind == 'venues' else Artist
+  return model.__table__.columns.keys()
+
+def add_show_counts(model, counts):
+  # counts maps ids to (upcoming, past) increments, applied in one executemany
+  table = model.__table__
+  if counts:
+    db.session.execute(table.update().where(table.c.id == db.bindparam('counted_id')).values(
+      upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('upcoming'),
+      past_shows_count=table.c.past_shows_count + db.bindparam('past')
+    ), [{'counted_id': id, 'upcoming': upcoming, 'past': past} for id, (upcoming, past) in counts.items()])
+
+def bump_versions(*names):
+  # part of the write's transaction, so readers see the new data and the new
+  # version together; the row lock serializes concurrent writes of a kind
+  db.session.query(DataVersion).filter(DataVersion.name.in_(names)) \
+    .update({'version': DataVersion.version + 1}, synchronize_session=False)
+
+def count_shows(shows, delta=1):
+  '''
+  count_shows(shows, delta=1)
+      adds delta to the show counters of the venues and artists of shows
+      (dicts with venue_id, artist_id and start_time) when they are inserted,
+      or subtracts it when they are deleted
+  '''
+  # the shared lock keeps refresh_show_counts from moving counted_until until commit
+  counted_until = db.session.query(ShowCounts.counted_until).with_for_update(read=True).scalar()
+
+  for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+    counts = defaultdict(lambda: [0, 0])
+    for show in shows:
+      counts[int(show[key])][show['start_time'] <= counted_until] += delta
+    add_show_counts(model, counts)
+
+def refresh_show_counts(now=None):
+  '''
+  refresh_show_counts(now=None)
+      moves the shows that started since the last refresh from the upcoming
+      to the past counters, and returns how many there were
+  '''
+  now = now or datetime.now()
+  counted_until = db.session.query(ShowCounts.counted_until).with_for_update().scalar()
+  started = db.and_(Show.start_time > counted_until, Show.start_time <= now)
+
+  moved = 0
+  for model, key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    # a range scan on ix_Show_start_time_id over the shows started since
+    rows = db.session.query(key, db.func.count(Show.id)).filter(started).group_by(key).all()
+    add_show_counts(model, {id: (-count, count) for id, count in rows})
+    # the same shows are counted for venues and for artists
+    moved = sum(count for id, count in rows)
+
+  db.session.query(ShowCounts).update({'counted_until': now})
+  bump_versions('venue', 'artist', 'show')
+  return moved
+
+def rebuild_show_counts(now=None):
+  # recounts every venue and artist, e.g. after shows were written around count_shows
+  now = now or datetime.now()
+  db.session.query(ShowCounts).with_for_update().all()
+
+  for model, key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    def count(criterion):
+      return db.select(db.func.count(Show.id)).where(key == model.id, criterion).scalar_subquery()
+    db.session.query(model).update({
+      'upcoming_shows_count': count(Show.start_time > now),
+      'past_shows_count': count(Show.start_time <= now)
+    }, synchronize_session=False)
+
+  db.session.query(ShowCounts).update({'counted_until': now})
+  bump_versions('venue', 'artist', 'show')
+
+def get_venue_areas(genre=None):
+  '''
+  get_venue_areas(genre=None)
+      returns the venues grouped by area, each with its upcoming show count
+  '''
+  # a single query returns every venue with its upcoming show counter,
+  # sorted by area so the rows can be grouped without further round trips
+  query = db.session.query(
+      Venue.id, Venue.name, Venue.city, Venue.state,
+      Venue.upcoming_shows_count.label('num_upcoming_shows'))
+
+  if genre:
+    query = query.join(venue_genres, venue_genres.c.venue_id == Venue.id) \
+      .join(Genre, Genre.id == venue_genres.c.genre_id) \
+      .filter(Genre.name == genre)
+
+  rows = query.order_by(Venue.state, Venue.city, Venue.name).all()
+
+  data=[]
+  for (city, state), area_rows in groupby(rows, key=lambda row: (row.city, row.state)):
+    record = {
+      'city': city,
+      'state': state,
+      'venues': [{
+        'id': row.id,
+        'name': row.name,
+        'num_upcoming_shows': row.num_upcoming_shows
+      } for row in area_rows]
+    }
+    data.append(record)
+
+  return data
+
+# pages showing a whole venue or artist load the deferred profile columns up front
+PROFILE = db.undefer_group('profile')
+
+def get_listing(model):
+  # list and search pages only link to each record, so they fetch plain rows
+  # of these columns instead of full model instances
+  return db.session.query(model.id, model.name, model.city, model.state)
+
+def filter_artists(query, filters):
+  # city and state are served by ix_Artist_state_city_name, genre by artist_genres
+  if 'genre' in filters:
+    query = query.join(artist_genres, artist_genres.c.artist_id == Artist.id) \
+      .join(Genre, Genre.id == artist_genres.c.genre_id) \
+      .filter(Genre.name == filters['genre'])
+  if 'state' in filters:
+    query = query.filter(Artist.state == filters['state'])
+  if 'city' in filters:
+    query = query.filter(Artist.city == filters['city'])
+  if 'seeking_venue' in filters:
+    query = query.filter(Artist.seeking_venue == bool(filters['seeking_venue']))
+  return query
+
+def get_artists_page(filters, sort='name', cursor=None, per_page=ARTISTS_PER_PAGE):
+  '''
+  get_artists_page(filters, sort='name', cursor=None, per_page=ARTISTS_PER_PAGE)
+      returns (artists, next_cursor) for one page of the artists matching
+      filters, by name or newest first
+  '''
+  query = filter_artists(get_listing(Artist), filters)
+
+  # keyset pagination like get_shows_page; names are unique, so by name the
+  # last name is the whole cursor
+  if sort == 'created_at':
+    query = query.add_columns(Artist.created_at)
+    if cursor:
+      query = query.filter(db.tuple_(Artist.created_at, Artist.id) < parse_cursor(cursor))
+    query = query.order_by(Artist.created_at.desc(), Artist.id.desc())
+  else:
+    if cursor:
+      query = query.filter(Artist.name > cursor)
+    query = query.order_by(Artist.name)
+
+  rows = query.limit(per_page + 1).all()
+
+  next_cursor = None
+  if len(rows) > per_page:
+    last = rows[per_page - 1]
+    next_cursor = format_cursor(last.created_at, last.id) if sort == 'created_at' else last.name
+
+  return rows[:per_page], next_cursor
+
+def estimate_artists_count(filters):
+  # counted at most once per cache timeout for each filter, so the total is an
+  # estimate that may trail recent edits
+  key = 'count:artists:' + repr(sorted(filters.items()))
+  return cache.get_or_set(key,
+    lambda: filter_artists(db.session.query(db.func.count(Artist.id)).select_from(Artist), filters).scalar())
+
+def get_shows_page(cursor=None, upcoming=False):
+  '''
+  get_shows_page(cursor=None, upcoming=False)
+      returns (shows, next_cursor) for one page of shows ordered by start time
+  '''
+  # keyset pagination on (start_time, id): the cursor is the last show of the
+  # previous page, so every page costs the same regardless of show history
+  query = db.session.query(
+      Show.id, Show.start_time,
+      Show.venue_id, Venue.name.label('venue_name'),
+      Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')
+    ).join(Venue, Show.venue_id == Venue.id) \
+    .join(Artist, Show.artist_id == Artist.id)
+
+  if upcoming:
+    query = query.filter(Show.start_time > datetime.now())
+  if cursor:
+    query = query.filter(db.tuple_(Show.start_time, Show.id) > parse_cursor(cursor))
+
+  rows = query.order_by(Show.start_time, Show.id).limit(SHOWS_PER_PAGE + 1).all()
+
+  next_cursor = None
+  if len(rows) > SHOWS_PER_PAGE:
+    last = rows[SHOWS_PER_PAGE - 1]
+    next_cursor = format_cursor(last.start_time, last.id)
+
+  return rows[:SHOWS_PER_PAGE], next_cursor
+
+def format_cursor(time, id):
+  return '{}_{}'.format(time.isoformat(), id)
+
+def parse_cursor(cursor):
+  try:
+    time, id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(time), int(id)
+  except ValueError:
+    abort(400)
+
+RECENT_VENUES_KEY = 'recent_venues'
+RECENT_ARTISTS_KEY = 'recent_artists'
+
+def get_recently_listed(model, limit=10):
+  # plain dicts rather than ORM objects, so they can outlive the session in the cache
+  rows = db.session.query(model.id, model.name) \
+    .filter(model.created_at.isnot(None)) \
+    .order_by(model.created_at.desc()) \
+    .limit(limit) \
+    .all()
+  return [row._asdict() for row in rows]
+
+def render_cached(template_name, key, load):
+  '''
+  render_cached(template_name, key, load)
+      renders template_name with the context returned by load(), reusing the
+      title and content blocks cached under key; the layout around them
+      (flash messages, navigation) is rendered on every request
+  '''
+  def render_blocks():
+    template = app.jinja_env.get_template(template_name)
+    context = load()
+    app.update_template_context(context)
+    start = time.perf_counter()
+    blocks = {name: Markup(''.join(template.blocks[name](template.new_context(context))))
+      for name in ('title', 'content')}
+    add_render_time(time.perf_counter() - start)
+    return blocks
+
+  blocks = cache.get_or_set(key, render_blocks, timeout=app.config.get('PAGE_CACHE_TIMEOUT'))
+  return render_template(template_name, cached_blocks=blocks)
+
+def get_genres(names):
+  '''
+  get_genres(names)
+      returns the Genre rows for names, creating the ones that do not exist yet
+  '''
+  genres = Genre.query.filter(Genre.name.in_(names)).all()
+  existing = {genre.name for genre in genres}
+  return genres + [Genre(name=name) for name in names if name not in existing]
+
+def form_columns(model, form_class):
+  # the model columns that the form edits
+  return [key for key in model.__table__.columns.keys() if hasattr(form_class, key)]
+
+def write(form, action):
+  '''
+  write(form, action)
+      validates form and runs action() in one transaction; returns
+      (result, None), or (None, message) when the form is invalid or the
+      write violates a constraint
+  '''
+  if not form.validate():
+    return None, ' '.join('{}: {}'.format(form[name].label.text, ' '.join(errors))
+      for name, errors in form.errors.items())
+
+  try:
+    result = action()
+    db.session.commit()
+  except IntegrityError as error:
+    db.session.rollback()
+    return None, integrity_message(error, form.data)
+  except Conflict as error:
+    db.session.rollback()
+    return None, str(error)
+  return result, None
+
+def save_entity(model, association, key, form, entity_id=None):
+  '''
+  save_entity(model, association, key, form, entity_id=None)
+      writes a venue or artist form without loading the record first and
+      returns its id; new records update an existing one with the same name
+  '''
+  # only the fields the page submitted: the forms do not render every column
+  # of the model (e.g. image_link), and those must keep their value
+  values = {column: form[column].data or None for column in form_columns(model, type(form)) if column in request.form}
+  values['genres'] = genres_column(form.genres.data)
+
+  if entity_id is None:
+    entity_id = upsert(db.session, model, values)
+  elif not update(db.session, model, entity_id, values):
+    abort(404)
+
+  # relinking the genres is cheaper than diffing them
+  genres = get_genres(form.genres.data)
+  db.session.add_all(genres)
+  db.session.flush()
+  db.session.execute(association.delete().where(association.c[key] == entity_id))
+  db.session.execute(association.insert(), [{'genre_id': genre.id, key: entity_id} for genre in genres])
+  bump_versions(model.__tablename__.lower())
+  return entity_id
+
+def book_show(venue_id, artist_id, start_time):
+  '''
+  book_show(venue_id, artist_id, start_time)
+      adds a show, raising Conflict if the venue or the artist is already
+      booked at that time
+  '''
+  # locks the venue row until commit, so concurrent bookings of a venue are
+  # checked one after the other (Postgres; SQLite serializes all writes)
+  db.session.query(Venue.id).filter(Venue.id == venue_id).with_for_update().first()
+
+  for show in get_conflicting_shows(venue_id, artist_id, start_time):
+    if show.venue_id == venue_id:
+      raise Conflict('Venue {} is already booked at {}.'.format(venue_id, format_datetime(show.start_time)))
+    raise Conflict('Artist {} is already playing at {}.'.format(artist_id, format_datetime(show.start_time)))
+
+  db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time))
+  count_shows([{'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}])
+  bump_versions('venue', 'artist', 'show')
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 @app.route('/')
 def index():
-  venues_recent = Venue.query.filter(Venue.created_at.isnot(None)).order_by(Venue.created_at.desc()).limit(10).all()
-  artists_recent = Artist.query.filter(Artist.created_at.isnot(None)).order_by(Artist.created_at.desc()).limit(10).all()
+  # the panels are invalidated by the venue and artist create, edit and delete handlers
+  venues_recent = cache.get_or_set(RECENT_VENUES_KEY, lambda: get_recently_listed(Venue))
+  artists_recent = cache.get_or_set(RECENT_ARTISTS_KEY, lambda: get_recently_listed(Artist))
 
   return render_template('pages/home.html', venues=venues_recent, artists=artists_recent)
 
@@ -105,33 +736,19 @@ def index():
 
 @app.route('/venues')
 def venues():
-  data=[]
-  areas_list = Venue.query.distinct('city', 'state').all()
-  for area in areas_list:
-    record = {
-      'city': area.city,
-      'state': area.state,
-      'venues': Venue.query.filter_by(city=area.city, state=area.state)
-    }
-    data.append(record)
+  genre = request.args.get('genre')
+  key = 'page:venues:{}:{}:{}'.format(genre, cache.version('venue'), cache.version('show'))
 
-  return render_template('pages/venues.html', areas=data);
+  return render_cached('pages/venues.html', key, lambda: {'areas': get_venue_areas(genre), 'genre': genre})
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
+  # matches name, city, state and genres, e.g. "jazz san francisco" or "San Francisco, CA"
   search_term = request.form.get('search_term', '')
-
-  # search by city and state, should be improved by providing a picklist with by what term to search
-  if search_term.count(','):
-    city_state = search_term.split(',')
-    city=city_state[0]
-    state=city_state[1]
-    data = Venue.query.filter_by(city=city.strip(), state=state.strip()).all()
-  else:
-    data = Venue.query.filter(Venue.name.ilike('%{}%'.format(search_term.lower()))).all()
+  data, count = search(get_listing(Venue), Venue, search_term)
 
   response={
-    "count": len(data),
+    "count": count,
     "data": data
   }
 
@@ -139,33 +756,15 @@ def search_venues():
 
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
-  # shows the venue page with the given venue_id
+  # shows the venue page with the given venue_id, which also lists artist names
+  key = 'page:venue:{}:{}:{}'.format(venue_id, cache.version('venue', venue_id), cache.version('artist'))
 
-  show_dict = {}
-  upcoming_shows = []
-  past_shows = []
-  current_time = datetime.now()
+  def load():
+    data = Venue.query.options(PROFILE).get_or_404(venue_id)
+    data.upcoming_shows, data.past_shows = get_venue_shows(venue_id)
+    return {'venue': data}
 
-  data = Venue.query.get(venue_id)
-  data.genres = data.genres.strip('{,}').split(',')
-
-  shows = data.shows
-  for show in shows:
-    show_dict['artist_id']=show.artist.id
-    show_dict['artist_name'] = show.artist.name
-    show_dict['artist_image_link'] = show.artist.image_link
-    show_dict['start_time']=format_datetime(str(show.start_time))
-    if show.start_time > current_time:
-      upcoming_shows.append(show_dict.copy())
-    else:
-      past_shows.append(show_dict.copy())
-
-  data.upcoming_shows = upcoming_shows
-  data.upcoming_shows_count = len(upcoming_shows)
-  data.past_shows = past_shows
-  data.past_shows_count = len(past_shows)
-
-  return render_template('pages/show_venue.html', venue=data)
+  return render_cached('pages/show_venue.html', key, load)
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -177,38 +776,31 @@ def create_venue_form():
 
 @app.route('/venues/create', methods=['POST'])
 def create_venue_submission():
-  error = False
-  try:
-    name = request.form['name']
-    city = request.form['city']
-    state = request.form['state']
-    address = request.form['address']
-    phone = request.form['phone']
-    genres = VenueForm(request.form).genres.data
-    facebook_link = request.form['facebook_link']
-
-    venue = Venue(name=name, city=city, state=state, address=address, phone=phone, genres=genres, facebook_link=facebook_link)
-    db.session.add(venue)
-    db.session.commit()
+  form = VenueForm()
+  venue_id, error = write(form, lambda: save_entity(Venue, venue_genres, 'venue_id', form))
 
-  except Exception:
-    error = True
-    db.session.rollback()
-  finally:
-    db.session.close()
-    if error:
-      flash('An error occurred. Venue ' + name + ' could not be listed.', 'error')
-    else:
-      flash('Venue ' + name + ' was successfully listed!', 'success')
+  if error:
+    flash('An error occurred. Venue ' + form.name.data + ' could not be listed. ' + error, 'error')
+  else:
+    # the name may have matched an existing venue, which was updated instead
+    cache.delete(RECENT_VENUES_KEY)
+    cache.bump('venue', venue_id)
+    cache.bump('venue')
+    flash('Venue ' + form.name.data + ' was successfully listed!', 'success')
 
-  return render_template('pages/home.html')
+  return redirect(url_for('index'))
 
 @app.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   response = {}
   try:
     Venue.query.filter_by(id=venue_id).delete()
+    # its shows are deleted with it
+    bump_versions('venue', 'show')
     db.session.commit()
+    cache.delete(RECENT_VENUES_KEY)
+    cache.bump('venue', venue_id)
+    cache.bump('venue')
     response['success'] = True
   except Exception:
     db.session.rollback()
@@ -220,59 +812,70 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
+def get_artists_args():
+  '''
+  get_artists_args()
+      returns (filters, sort, cursor, per_page) from the query string of an
+      artists listing, with the page size capped at MAX_ARTISTS_PER_PAGE
+  '''
+  filters = {name: request.args[name] for name in ('genre', 'city', 'state') if request.args.get(name)}
+  seeking_venue = request.args.get('seeking_venue', type=int)
+  if seeking_venue is not None:
+    filters['seeking_venue'] = seeking_venue
+
+  sort = request.args.get('sort', 'name')
+  if sort not in ARTIST_SORTS:
+    abort(400)
+
+  per_page = request.args.get('per_page', ARTISTS_PER_PAGE, type=int)
+  per_page = max(1, min(per_page, MAX_ARTISTS_PER_PAGE))
+
+  return filters, sort, request.args.get('cursor'), per_page
+
 @app.route('/artists')
 def artists():
-  data = Artist.query.all()
-  return render_template('pages/artists.html', artists=data)
+  filters, sort, cursor, per_page = get_artists_args()
+  key = 'page:artists:{}:{}'.format(request.query_string.decode(), cache.version('artist'))
+
+  def load():
+    data, next_cursor = get_artists_page(filters, sort, cursor, per_page)
+    # links keep the filters, sort order and page size of this page
+    args = dict(filters, sort=sort if sort != 'name' else None,
+      per_page=per_page if per_page != ARTISTS_PER_PAGE else None)
+    return {
+      'artists': data,
+      'count': estimate_artists_count(filters),
+      'filters': filters,
+      'sort': sort,
+      'args': args,
+      'next_cursor': next_cursor
+    }
+
+  return render_cached('pages/artists.html', key, load)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
+  # matches name, city, state and genres, e.g. "jazz san francisco" or "San Francisco, CA"
   search_term = request.form.get('search_term', '')
-
-  # search by city and state, should be improved by providing a picklist with by what term to search
-  if search_term.count(','):
-    city_state = search_term.split(',')
-    city=city_state[0]
-    state=city_state[1]
-    data = Artist.query.filter_by(city=city.strip(), state=state.strip()).all()
-  else:
-    data = Artist.query.filter(Artist.name.ilike('%{}%'.format(search_term.lower()))).all()
+  data, count = search(get_listing(Artist), Artist, search_term)
 
   response = {
-    "count": len(data),
+    "count": count,
     "data": data
   }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-  # shows the artist page with the given artist_id
-
-  show_dict = {}
-  upcoming_shows = []
-  past_shows = []
-  current_time = datetime.now()
+  # shows the artist page with the given artist_id, which also lists venue names
+  key = 'page:artist:{}:{}:{}'.format(artist_id, cache.version('artist', artist_id), cache.version('venue'))
 
-  data = Artist.query.get(artist_id)
-  data.genres = data.genres.strip('{,}').split(',')
-
-  shows = data.shows
-  for show in shows:
-    show_dict['venue_id'] = show.venue.id
-    show_dict['venue_name'] = show.venue.name
-    show_dict['venue_image_link'] = show.venue.image_link
-    show_dict['start_time'] = format_datetime(str(show.start_time))
-    if show.start_time > current_time:
-      upcoming_shows.append(show_dict.copy())
-    else:
-      past_shows.append(show_dict.copy())
-
-  data.upcoming_shows = upcoming_shows
-  data.upcoming_shows_count = len(upcoming_shows)
-  data.past_shows = past_shows
-  data.past_shows_count = len(past_shows)
+  def load():
+    data = Artist.query.options(PROFILE).get_or_404(artist_id)
+    data.upcoming_shows, data.past_shows = get_artist_shows(artist_id)
+    return {'artist': data}
 
-  return render_template('pages/show_artist.html', artist=data)
+  return render_cached('pages/show_artist.html', key, load)
 
 #  Update
 #  ----------------------------------------------------------------
@@ -284,34 +887,16 @@ def edit_artist(artist_id):
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-  error = False
-  try:
-    name = request.form['name']
-    city = request.form['city']
-    state = request.form['state']
-    phone = request.form['phone']
-    genres = ArtistForm(request.form).genres.data
-    facebook_link = request.form['facebook_link']
-
-    artist = Artist.query.get(artist_id)
-    artist.name = name
-    artist.city = city
-    artist.state = state
-    artist.phone = phone
-    artist.genres = genres
-    artist.facebook_link = facebook_link
-
-    db.session.commit()
+  form = ArtistForm()
+  _, error = write(form, lambda: save_entity(Artist, artist_genres, 'artist_id', form, artist_id))
 
-  except Exception:
-    error = True
-    db.session.rollback()
-  finally:
-    db.session.close()
-    if error:
-      flash('An error occurred. Artist ' + name + ' could not be updated.', 'error')
-    else:
-      flash('Artist ' + name + ' was successfully updated!', 'success')
+  if error:
+    flash('An error occurred. Artist ' + form.name.data + ' could not be updated. ' + error, 'error')
+  else:
+    cache.delete(RECENT_ARTISTS_KEY)
+    cache.bump('artist', artist_id)
+    cache.bump('artist')
+    flash('Artist ' + form.name.data + ' was successfully updated!', 'success')
 
   return redirect(url_for('show_artist', artist_id=artist_id))
 
@@ -323,36 +908,16 @@ def edit_venue(venue_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-  error = False
-  try:
-    name = request.form['name']
-    city = request.form['city']
-    state = request.form['state']
-    address = request.form['address']
-    phone = request.form['phone']
-    genres = VenueForm(request.form).genres.data
-    facebook_link = request.form['facebook_link']
-
-    venue = Venue.query.get(venue_id)
-    venue.name = name
-    venue.city = city
-    venue.state = state
-    venue.address = address
-    venue.phone = phone
-    venue.genres = genres
-    venue.facebook_link = facebook_link
-
-    db.session.commit()
+  form = VenueForm()
+  _, error = write(form, lambda: save_entity(Venue, venue_genres, 'venue_id', form, venue_id))
 
-  except Exception:
-    error = True
-    db.session.rollback()
-  finally:
-    db.session.close()
-    if error:
-      flash('An error occurred. Venue ' + name + ' could not be updated.', 'error')
-    else:
-      flash('Venue ' + name + ' was successfully updated!', 'success')
+  if error:
+    flash('An error occurred. Venue ' + form.name.data + ' could not be updated. ' + error, 'error')
+  else:
+    cache.delete(RECENT_VENUES_KEY)
+    cache.bump('venue', venue_id)
+    cache.bump('venue')
+    flash('Venue ' + form.name.data + ' was successfully updated!', 'success')
 
   return redirect(url_for('show_venue', venue_id=venue_id))
 
@@ -367,37 +932,30 @@ def create_artist_form():
 @app.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   # called upon submitting the new artist listing form
-  error = False
-  try:
-    name = request.form['name']
-    city = request.form['city']
-    state = request.form['state']
-    phone = request.form['phone']
-    genres = ArtistForm(request.form).genres.data
-    facebook_link = request.form['facebook_link']
-
-    artist = Artist(name=name, city=city, state=state, phone=phone, genres=genres, facebook_link=facebook_link)
-    db.session.add(artist)
-    db.session.commit()
+  form = ArtistForm()
+  artist_id, error = write(form, lambda: save_entity(Artist, artist_genres, 'artist_id', form))
 
-  except Exception:
-    error = True
-    db.session.rollback()
-  finally:
-    db.session.close()
-    if error:
-      flash('An error occurred. Artist ' + name + ' could not be listed.', 'error')
-    else:
-      flash('Artist ' + name + ' was successfully listed!', 'success')
+  if error:
+    flash('An error occurred. Artist ' + form.name.data + ' could not be listed. ' + error, 'error')
+  else:
+    # the name may have matched an existing artist, which was updated instead
+    cache.delete(RECENT_ARTISTS_KEY)
+    cache.bump('artist', artist_id)
+    cache.bump('artist')
+    flash('Artist ' + form.name.data + ' was successfully listed!', 'success')
 
-  return render_template('pages/home.html')
+  return redirect(url_for('index'))
 
 @app.route('/artists/<artist_id>', methods=['DELETE'])
 def delete_artist(artist_id):
   response = {}
   try:
     Artist.query.filter_by(id=artist_id).delete()
+    bump_versions('artist', 'show')
     db.session.commit()
+    cache.delete(RECENT_ARTISTS_KEY)
+    cache.bump('artist', artist_id)
+    cache.bump('artist')
     response['success'] = True
   except Exception:
     db.session.rollback()
@@ -412,15 +970,10 @@ def delete_artist(artist_id):
 
 @app.route('/shows')
 def shows():
-  data = Show.query.all()
-
-  for show in data:
-    show.venue_name = show.venue.name
-    show.artist_name = show.artist.name
-    show.artist_image_link = show.artist.image_link
-    show.start_time = format_datetime(str(show.start_time))
+  upcoming = request.args.get('upcoming', 0, type=int)
+  data, next_cursor = get_shows_page(request.args.get('cursor'), upcoming)
 
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, upcoming=upcoming)
 
 @app.route('/shows/create')
 def create_shows():
@@ -430,35 +983,400 @@ def create_shows():
 
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
-  error = False
+  form = ShowForm()
+  _, error = write(form, lambda: book_show(int(form.venue_id.data), int(form.artist_id.data), form.start_time.data))
+
+  if error:
+    flash('An error occurred. Show could not be listed. ' + error, 'error')
+  else:
+    cache.bump('venue', form.venue_id.data)
+    cache.bump('artist', form.artist_id.data)
+    cache.bump('show')
+    flash('Show was successfully listed!', 'success')
+
+  return redirect(url_for('index'))
+
+@app.route('/shows/<int:show_id>', methods=['DELETE'])
+def delete_show(show_id):
+  show = db.session.query(Show.venue_id, Show.artist_id, Show.start_time).filter(Show.id == show_id).first_or_404()
+
+  Show.query.filter_by(id=show_id).delete()
+  count_shows([show._asdict()], delta=-1)
+  bump_versions('venue', 'artist', 'show')
+  db.session.commit()
+
+  cache.bump('venue', show.venue_id)
+  cache.bump('artist', show.artist_id)
+  cache.bump('show')
+  return jsonify({'success': True})
+
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+# Read-only JSON API. Every response carries an ETag built from the rows of
+# DataVersion that writes increment, so a client polling with If-None-Match
+# gets a 304 after a single primary key lookup.
+
+API_PREFIX = '/api/v1'
+
+MAX_FREE_SLOTS_RANGE = timedelta(days=92)
+
+VENUE_FIELDS = ['id', 'name', 'address', 'city', 'state', 'phone', 'website',
+  'facebook_link', 'seeking_talent', 'seeking_description', 'image_link']
+ARTIST_FIELDS = ['id', 'name', 'city', 'state', 'phone', 'website',
+  'facebook_link', 'seeking_venue', 'seeking_description', 'image_link']
+
+def get_version(*names, shows=False):
+  '''
+  get_version(*names, shows=False)
+      returns the versions of names, e.g. 'venue', which every write to them
+      increments; responses listing shows also change with the page cache
+      period, as upcoming shows become past ones without a write
+  '''
+  version = tuple(version for version, in db.session.query(DataVersion.version)
+    .filter(DataVersion.name.in_(names)).order_by(DataVersion.name))
+  if shows:
+    version += (int(time.time() // app.config['PAGE_CACHE_TIMEOUT']),)
+  return version
+
+def conditional_response(version, build):
+  '''
+  conditional_response(version, build)
+      answers If-None-Match with a 304 based on version alone, and only calls
+      build() for the JSON body when it has changed
+  '''
+  etag = hashlib.sha1(repr(version).encode('utf-8')).hexdigest()
+  not_modified = etag in request.if_none_match
+
+  response = Response(status=304) if not_modified else jsonify(build())
+  response.set_etag(etag)
+  return response
+
+def show_to_dict(show):
+  data = show._asdict()
+  data['start_time'] = show.start_time.isoformat()
+  return data
+
+def detail_to_dict(entity, fields, shows):
+  upcoming_shows, past_shows = shows
+
+  data = {field: getattr(entity, field) for field in fields}
+  data['genres'] = [genre.name for genre in entity.genre_list]
+  data['upcoming_shows'] = [show_to_dict(show) for show in upcoming_shows]
+  data['upcoming_shows_count'] = entity.upcoming_shows_count
+  data['past_shows'] = [show_to_dict(show) for show in past_shows]
+  data['past_shows_count'] = entity.past_shows_count
+  return data
+
+@app.route(API_PREFIX + '/venues')
+def api_venues():
+  genre = request.args.get('genre')
+  version = get_version('venue', 'show')
+
+  return conditional_response(version, lambda: {
+    'success': True,
+    'areas': get_venue_areas(genre)
+  })
+
+@app.route(API_PREFIX + '/venues/<int:venue_id>')
+def api_venue(venue_id):
+  # the listed artists may be renamed as well; a deleted venue changes the
+  # version, so a 304 never hides a 404
+  version = get_version('venue', 'artist', 'show', shows=True)
+
+  return conditional_response(version, lambda: {
+    'success': True,
+    'venue': detail_to_dict(Venue.query.options(PROFILE).get_or_404(venue_id), VENUE_FIELDS, get_venue_shows(venue_id))
+  })
+
+@app.route(API_PREFIX + '/venues/<int:venue_id>/free_slots')
+def api_venue_free_slots(venue_id):
+  # e.g. ?start=2020-05-21&end=2020-05-28, at most MAX_FREE_SLOTS_RANGE apart
   try:
-    artist_id = request.form['artist_id']
-    venue_id = request.form['venue_id']
-    start_time = request.form['start_time']
+    start = datetime.fromisoformat(request.args['start'])
+    end = datetime.fromisoformat(request.args['end'])
+  except (KeyError, ValueError):
+    abort(400)
+  if not timedelta(0) < end - start <= MAX_FREE_SLOTS_RANGE:
+    abort(400)
+  db.session.query(Venue.id).filter(Venue.id == venue_id).first_or_404()
+
+  return jsonify({
+    'success': True,
+    'free_slots': [{'start': slot_start.isoformat(), 'end': slot_end.isoformat()}
+      for slot_start, slot_end in get_free_slots(venue_id, start, end)]
+  })
+
+@app.route(API_PREFIX + '/export/<any(venues, artists, shows):kind>.<any(csv, jsonl):format>')
+def api_export(kind, format):
+  # e.g. /api/v1/export/shows.csv?start=2020-01-01&end=2021-01-01
+  try:
+    start, end = [datetime.fromisoformat(request.args[arg]) if request.args.get(arg) else None
+      for arg in ('start', 'end')]
+  except ValueError:
+    abort(400)
+
+  chunks = write_rows(get_export_rows(kind, start, end), get_export_columns(kind), format, EXPORT_BATCH_SIZE)
+  response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[format])
+  response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(kind, format)
+  return response
+
+@app.route(API_PREFIX + '/venues/search')
+def api_search_venues():
+  search_term = request.args.get('search_term', '')
+  version = get_version('venue')
+
+  def build():
+    data, count = search(get_listing(Venue), Venue, search_term)
+    return {
+      'success': True,
+      'count': count,
+      'venues': [{'id': venue.id, 'name': venue.name, 'city': venue.city, 'state': venue.state} for venue in data]
+    }
+
+  return conditional_response(version, build)
+
+@app.route(API_PREFIX + '/artists')
+def api_artists():
+  filters, sort, cursor, per_page = get_artists_args()
+  version = get_version('artist')
+
+  def build():
+    data, next_cursor = get_artists_page(filters, sort, cursor, per_page)
+    return {
+      'success': True,
+      'artists': [{'id': artist.id, 'name': artist.name, 'city': artist.city, 'state': artist.state} for artist in data],
+      'count': estimate_artists_count(filters),
+      'next_cursor': next_cursor
+    }
 
-    show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
-    db.session.add(show)
+  return conditional_response(version, build)
+
+@app.route(API_PREFIX + '/artists/<int:artist_id>')
+def api_artist(artist_id):
+  # the listed venues may be renamed as well; a deleted artist changes the
+  # version, so a 304 never hides a 404
+  version = get_version('artist', 'venue', 'show', shows=True)
+
+  return conditional_response(version, lambda: {
+    'success': True,
+    'artist': detail_to_dict(Artist.query.options(PROFILE).get_or_404(artist_id), ARTIST_FIELDS, get_artist_shows(artist_id))
+  })
+
+@app.route(API_PREFIX + '/artists/search')
+def api_search_artists():
+  search_term = request.args.get('search_term', '')
+  version = get_version('artist')
+
+  def build():
+    data, count = search(get_listing(Artist), Artist, search_term)
+    return {
+      'success': True,
+      'count': count,
+      'artists': [{'id': artist.id, 'name': artist.name, 'city': artist.city, 'state': artist.state} for artist in data]
+    }
+
+  return conditional_response(version, build)
+
+@app.route(API_PREFIX + '/shows')
+def api_shows():
+  upcoming = request.args.get('upcoming', 0, type=int)
+  cursor = request.args.get('cursor')
+  version = get_version('show', 'venue', 'artist', shows=True)
+
+  def build():
+    data, next_cursor = get_shows_page(cursor, upcoming)
+    return {
+      'success': True,
+      'shows': [show_to_dict(show) for show in data],
+      'next_cursor': next_cursor
+    }
+
+  return conditional_response(version, build)
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=5000, show_default=True)
+def import_command(kind, file, format, batch_size):
+  """Bulk import venues, artists or shows from a CSV or JSON lines FILE.
+
+  Venues and artists take the fields of the create forms, with genres as a
+  list or a comma separated string. Shows take artist and venue names (or
+  artist_id and venue_id) and a start_time such as "2020-05-21 21:30:00".
+  Invalid rows are reported and skipped.
+  """
+  stats = ImportStats()
+  rows = read_rows(file, format)
+
+  if kind == 'shows':
+    rows = validate_shows(rows, stats)
+  elif kind == 'venues':
+    rows = validate_entities(Venue, VenueForm, rows, stats)
+  else:
+    rows = validate_entities(Artist, ArtistForm, rows, stats)
+
+  for batch in batched(rows, batch_size):
+    if kind == 'shows':
+      db.session.execute(Show.__table__.insert(), batch)
+      count_shows(batch)
+    elif kind == 'venues':
+      insert_entities(Venue, venue_genres, 'venue_id', batch)
+    else:
+      insert_entities(Artist, artist_genres, 'artist_id', batch)
+    bump_versions('venue', 'artist', 'show')
     db.session.commit()
 
-  except Exception:
-    error = True
-    db.session.rollback()
-  finally:
-    db.session.close()
-    if error:
-      flash('An error occurred. Show could not be listed.', 'error')
+    stats.imported += len(batch)
+    click.echo(stats.report(kind), err=True)
+
+  # only reaches this process' cache unless CACHE_BACKEND is shared
+  cache.delete(RECENT_VENUES_KEY, RECENT_ARTISTS_KEY)
+  cache.bump('venue')
+  cache.bump('artist')
+  cache.bump('show')
+  click.echo(stats.report(kind))
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+@click.option('--start', type=click.DateTime(), help='Only shows starting at or after START.')
+@click.option('--end', type=click.DateTime(), help='Only shows starting before END.')
+def export_command(kind, format, output, start, end):
+  """Export all venues, artists or shows as CSV or JSON lines.
+
+  The output can be imported again with "flask import".
+  """
+  if kind != 'shows' and (start or end):
+    raise click.UsageError('--start and --end only apply to shows.')
+
+  for chunk in write_rows(get_export_rows(kind, start, end), get_export_columns(kind), format, EXPORT_BATCH_SIZE):
+    output.write(chunk)
+
+@app.cli.command('refresh-show-counts')
+@click.option('--rebuild', is_flag=True, help='Recount the shows of every venue and artist.')
+def refresh_show_counts_command(rebuild):
+  """Move the shows that have started to the past show counters.
+
+  Run this regularly, e.g. every few minutes from cron: until it runs, a
+  show that has started is still counted as upcoming.
+  """
+  if rebuild:
+    rebuild_show_counts()
+    click.echo('Rebuilt the show counters')
+  else:
+    click.echo('Moved {} shows to the past'.format(refresh_show_counts()))
+  db.session.commit()
+
+  # only reaches this process' cache unless CACHE_BACKEND is shared
+  cache.bump('venue')
+  cache.bump('artist')
+  cache.bump('show')
+
+def reject(stats, line_number, errors):
+  stats.rejected += 1
+  click.echo('line {}: {}'.format(line_number, errors), err=True)
+
+def validate_entities(model, form_class, rows, stats):
+  # names are unique, so duplicates are rejected here rather than failing a whole batch
+  names = set(name for name, in db.session.query(model.name))
+  # executemany needs the same keys in every row, so missing optional fields become None
+  columns = form_columns(model, form_class)
+
+  for line_number, row in rows:
+    data, errors = validate_row(form_class, row, multiple=('genres',))
+    if errors:
+      reject(stats, line_number, errors)
+    elif data['name'] in names:
+      reject(stats, line_number, {'name': ['{} already exists.'.format(data['name'])]})
+    else:
+      names.add(data['name'])
+      data = {key: data.get(key) for key in columns}
+      data['genre_list'] = data['genres']
+      data['genres'] = genres_column(data['genres'])
+      yield data
+
+def insert_entities(model, association, key, batch):
+  # one executemany for the rows, then one for their genre links
+  genre_names = [data.pop('genre_list') for data in batch]
+  db.session.execute(model.__table__.insert(), batch)
+
+  ids = dict(db.session.query(model.name, model.id).filter(model.name.in_([data['name'] for data in batch])))
+  genres = {genre.name: genre for genre in get_genres(sorted(set(name for names in genre_names for name in names)))}
+  db.session.add_all(genres.values())
+  db.session.flush()
+
+  links = [{'genre_id': genres[name].id, key: ids[data['name']]}
+    for data, names in zip(batch, genre_names) for name in set(names)]
+  if links:
+    db.session.execute(association.insert(), links)
+
+def validate_shows(rows, stats):
+  # artists and venues are resolved through maps loaded once, not a query per row
+  artist_ids = dict(db.session.query(Artist.name, Artist.id))
+  venue_ids = dict(db.session.query(Venue.name, Venue.id))
+  known_ids = {'artist_id': set(artist_ids.values()), 'venue_id': set(venue_ids.values())}
+
+  for line_number, row in rows:
+    row = dict(row)
+    if 'artist' in row:
+      row['artist_id'] = artist_ids.get(row.pop('artist'), 0)
+    if 'venue' in row:
+      row['venue_id'] = venue_ids.get(row.pop('venue'), 0)
+
+    data, errors = validate_row(ShowForm, row)
+    if errors is None:
+      errors = {}
+      for key in ('artist_id', 'venue_id'):
+        try:
+          data[key] = int(data.get(key) or 0)
+        except ValueError:
+          data[key] = 0
+        if data[key] not in known_ids[key]:
+          errors[key] = ['Unknown {}.'.format(key.split('_')[0])]
+
+    if errors:
+      reject(stats, line_number, errors)
     else:
-      flash('Show was successfully listed!', 'success')
+      yield data
 
-  return render_template('pages/home.html')
 
+@app.errorhandler(400)
+def bad_request_error(error):
+    if request.path.startswith(API_PREFIX):
+        return jsonify({
+          "success": False,
+          "error": 400,
+          "message": "Bad request"
+        }), 400
+    return error
 
 @app.errorhandler(404)
 def not_found_error(error):
+    if request.path.startswith(API_PREFIX):
+        return jsonify({
+          "success": False,
+          "error": 404,
+          "message": "Not found"
+        }), 404
     return render_template('errors/404.html'), 404
 
 @app.errorhandler(500)
 def server_error(error):
+    if request.path.startswith(API_PREFIX):
+        return jsonify({
+          "success": False,
+          "error": 500,
+          "message": "Internal Server Error"
+        }), 500
     return render_template('errors/500.html'), 500
 
 
@@ -0,0 +1,145 @@
+#----------------------------------------------------------------------------#
+# Shared helpers for the Fyyur benchmarks.
+#
+# Run a benchmark from the project root, e.g. "python -m benchmarks.venues".
+# Benchmarks use a throwaway SQLite database unless BENCHMARK_DATABASE_URL
+# points at another (e.g. Postgres) database.
+#----------------------------------------------------------------------------#
+
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import Table, event
+
+from app import app, db, Venue, Artist, Show, Genre, venue_genres, artist_genres, rebuild_show_counts
+
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'FL', 'MA', 'CO', 'OR', 'GA']
+GENRES = ['Jazz', 'Blues', 'Folk', 'Rock n Roll', 'Classical', 'Hip-Hop', 'Soul']
+
+
+def setup_database():
+  '''
+  setup_database()
+      points the app at the benchmark database and creates a fresh schema
+  '''
+  url = os.environ.get('BENCHMARK_DATABASE_URL')
+  if url is None:
+    url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'fyyur_benchmark.db')
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+  app.config['WTF_CSRF_ENABLED'] = False
+
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+
+
+def seed(venues=1000, areas=100, artists=1000, shows=10000, batch_size=10000):
+  '''
+  seed()
+      bulk inserts synthetic venues, artists and shows, with shows spread
+      evenly over the past and the next year
+  '''
+  rnd = random.Random(42)
+  now = datetime.now()
+
+  def insert(model, rows):
+    for start in range(0, len(rows), batch_size):
+      if isinstance(model, Table):
+        db.session.execute(model.insert(), rows[start:start + batch_size])
+      else:
+        db.session.bulk_insert_mappings(model, rows[start:start + batch_size])
+    db.session.commit()
+
+  def genres(rows):
+    return ['{' + ','.join(rnd.sample(GENRES, 2)) + '}' for _ in range(rows)]
+
+  def profile(kind, i):
+    # fills the deferred profile columns to realistic lengths
+    return {
+      'seeking_description': 'Looking for {} to play with, '.format(kind) * 16,
+      'website': 'https://www.example.com/{}/{}'.format(kind, i),
+      'image_link': 'https://images.example.com/photos/{}/{}/large.jpg?fit=crop&w=300&q=80'.format(kind, i),
+      'facebook_link': 'https://www.facebook.com/{}{}'.format(kind, i)
+    }
+
+  def genre_links(key, values):
+    genre_ids = dict((name, id) for id, name in enumerate(GENRES, 1))
+    return [{'genre_id': genre_ids[name], key: id}
+      for id, value in enumerate(values, 1) for name in value.strip('{}').split(',')]
+
+  venue_genre_values = genres(venues)
+  artist_genre_values = genres(artists)
+
+  with app.app_context():
+    insert(Genre, [{'id': id, 'name': name} for id, name in enumerate(GENRES, 1)])
+
+    insert(Venue, [{
+      'id': i,
+      'name': 'Venue {}'.format(i),
+      'city': 'City {}'.format(i % areas),
+      'state': STATES[i % areas % len(STATES)],
+      'address': '{} Main Street'.format(i),
+      'genres': venue_genre_values[i - 1],
+      'created_at': now - timedelta(minutes=i),
+      **profile('artists', i)
+    } for i in range(1, venues + 1)])
+
+    insert(Artist, [{
+      'id': i,
+      'name': 'Artist {}'.format(i),
+      'city': 'City {}'.format(i % areas),
+      'state': STATES[i % areas % len(STATES)],
+      'genres': artist_genre_values[i - 1],
+      'created_at': now - timedelta(minutes=i),
+      **profile('venues', i)
+    } for i in range(1, artists + 1)])
+
+    insert(venue_genres, genre_links('venue_id', venue_genre_values))
+    insert(artist_genres, genre_links('artist_id', artist_genre_values))
+
+    insert(Show, [{
+      'id': i,
+      'venue_id': rnd.randint(1, venues),
+      'artist_id': rnd.randint(1, artists),
+      'start_time': now + timedelta(hours=rnd.randint(-24 * 365, 24 * 365))
+    } for i in range(1, shows + 1)])
+
+    rebuild_show_counts(now)
+    db.session.commit()
+
+
+@contextmanager
+def count_queries():
+  '''
+  count_queries()
+      counts the SQL statements executed on the app engine inside the block
+  '''
+  counter = {'queries': 0}
+
+  def before_cursor_execute(*args):
+    counter['queries'] += 1
+
+  engine = db.get_engine(app)
+  event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+  try:
+    yield counter
+  finally:
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def measure(label, func, repeat=5):
+  '''
+  measure()
+      runs func repeatedly and prints the best wall time and query count
+  '''
+  timings = []
+  for _ in range(repeat):
+    with count_queries() as counter:
+      start = time.perf_counter()
+      func()
+      timings.append(time.perf_counter() - start)
+
+  print('{:<40} {:>10.2f} ms {:>8} queries'.format(label, min(timings) * 1000, counter['queries']))
@@ -0,0 +1,46 @@
+#----------------------------------------------------------------------------#
+# Per-row cost of the datetime template filter.
+#
+#   python -m benchmarks.datetime_format [shows]
+#----------------------------------------------------------------------------#
+
+import sys
+import time
+import babel.dates
+import dateutil.parser
+from datetime import datetime, timedelta
+
+from app import format_datetime
+
+
+def format_datetime_reparse(value, format='medium'):
+  # the previous filter: parse the stringified datetime, then format it
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def report(label, func, rows):
+  start = time.perf_counter()
+  func()
+  elapsed = time.perf_counter() - start
+  print('{:<40} {:>10.2f} ms {:>8.2f} us/row'.format(label, elapsed * 1000, elapsed / rows * 1e6))
+
+
+def main(shows=100000):
+  start_times = [datetime(2020, 1, 1) + timedelta(minutes=17 * i) for i in range(shows)]
+
+  print('{} shows'.format(shows))
+  # shows used to be formatted twice: to a 'medium' string in the view, then
+  # re-parsed by the template filter to render it 'full'
+  report('previous (str + parse, twice)',
+    lambda: [format_datetime_reparse(format_datetime_reparse(str(value)), 'full') for value in start_times], shows)
+  report('filter on datetime objects',
+    lambda: [format_datetime(value, 'full') for value in start_times], shows)
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,143 @@
+#----------------------------------------------------------------------------#
+# Load test of the main routes: latency percentiles and queries per request.
+#
+#   python -m benchmarks.load [--venues N] [--shows N] [--requests N]
+#                             [--server] [--concurrency N] [--cold]
+#
+# Requests go through the Flask test client, or with --server over HTTP to a
+# local threaded WSGI server from --concurrency client threads. Queries per
+# request are read from the Server-Timing header, so they are counted the
+# same way in both modes. --cold clears the cache before every request.
+#----------------------------------------------------------------------------#
+
+import argparse
+import logging
+import random
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from urllib.request import urlopen
+from werkzeug.serving import make_server
+
+from app import app, cache
+from benchmarks import setup_database, seed
+
+SEARCH_TERMS = ['venue 1', 'city 2', 'jazz', 'ca', 'blues city 3']
+
+
+def get_requests(args):
+  '''
+  get_requests(args)
+      returns the routes and the shuffled (route, method, path, data) of
+      the requests to send, picked with a fixed seed so runs are comparable
+  '''
+  rnd = random.Random(42)
+  routes = {
+    '/': lambda: ('GET', '/', None),
+    '/venues': lambda: ('GET', '/venues', None),
+    '/venues/<id>': lambda: ('GET', '/venues/{}'.format(rnd.randint(1, args.venues)), None),
+    '/artists/<id>': lambda: ('GET', '/artists/{}'.format(rnd.randint(1, args.venues)), None),
+    '/shows': lambda: ('GET', '/shows', None),
+    '/venues/search': lambda: ('POST', '/venues/search', {'search_term': rnd.choice(SEARCH_TERMS)}),
+    '/artists/search': lambda: ('POST', '/artists/search', {'search_term': rnd.choice(SEARCH_TERMS)}),
+  }
+  requests = [(route, *make()) for route, make in routes.items() for _ in range(args.requests)]
+  rnd.shuffle(requests)
+  return list(routes), requests
+
+
+def get_queries(headers):
+  match = re.search(r'desc="(\d+) queries"', headers.get('Server-Timing', ''))
+  return int(match.group(1)) if match else 0
+
+
+def test_client_sender():
+  client = app.test_client()
+
+  def send(method, path, data):
+    response = client.open(path, method=method, data=data)
+    assert response.status_code == 200, (path, response.status_code)
+    return get_queries(response.headers)
+  return send
+
+
+def http_sender(url):
+  def send(method, path, data):
+    with urlopen(url + path, data=urlencode(data).encode() if data else None) as response:
+      response.read()
+      return get_queries(response.headers)
+  return send
+
+
+def run(routes, requests, send, concurrency, cold):
+  '''
+  run(routes, requests, send, concurrency, cold)
+      sends the requests and returns {route: [(seconds, queries)]} and the
+      total wall time
+  '''
+  def timed(request):
+    route, method, path, data = request
+    if cold:
+      cache.clear()
+    start = time.perf_counter()
+    queries = send(method, path, data)
+    return route, time.perf_counter() - start, queries
+
+  results = {route: [] for route in routes}
+  start = time.perf_counter()
+  with ThreadPoolExecutor(concurrency) as executor:
+    for route, seconds, queries in executor.map(timed, requests):
+      results[route].append((seconds, queries))
+  return results, time.perf_counter() - start
+
+
+def report(results, wall_time):
+  print('{:<18} {:>8} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+    'route', 'requests', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms', 'queries'))
+  for route, samples in results.items():
+    timings = [seconds * 1000 for seconds, queries in samples]
+    percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+    print('{:<18} {:>8} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.1f}'.format(
+      route, len(samples), percentiles[49], percentiles[94], percentiles[98], max(timings),
+      statistics.mean(queries for seconds, queries in samples)))
+
+  total = sum(len(samples) for samples in results.values())
+  print('{} requests in {:.1f} s, {:.0f} requests/s'.format(total, wall_time, total / wall_time))
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Load test of the main Fyyur routes.')
+  parser.add_argument('--venues', type=int, default=10000, help='venues and artists to seed')
+  parser.add_argument('--shows', type=int, default=100000, help='shows to seed')
+  parser.add_argument('--requests', type=int, default=200, help='requests per route')
+  parser.add_argument('--server', action='store_true', help='send HTTP requests to a local WSGI server')
+  parser.add_argument('--concurrency', type=int, default=1, help='client threads')
+  parser.add_argument('--cold', action='store_true', help='clear the cache before every request')
+  args = parser.parse_args()
+
+  setup_database()
+  seed(venues=args.venues, areas=max(args.venues // 10, 1), artists=args.venues, shows=args.shows)
+  routes, requests = get_requests(args)
+
+  if args.server:
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    send = http_sender('http://127.0.0.1:{}'.format(server.server_port))
+  else:
+    send = test_client_sender()
+
+  print('{} venues and artists, {} shows, {} client threads, {} cache{}'.format(
+    args.venues, args.shows, args.concurrency, 'cold' if args.cold else 'warm',
+    ', HTTP' if args.server else ''))
+  report(*run(routes, requests, send, args.concurrency, args.cold))
+
+  if args.server:
+    server.shutdown()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,57 @@
+#----------------------------------------------------------------------------#
+# /artists listing: memory per row for full models vs. listing projections.
+#
+#   python -m benchmarks.memory [artists]
+#----------------------------------------------------------------------------#
+
+import sys
+import tracemalloc
+from flask import render_template
+
+from app import app, db, cache, Artist, ARTISTS_PER_PAGE, PROFILE, get_listing
+from benchmarks import setup_database, seed, measure
+
+
+def peak_bytes(func):
+  '''
+  peak_bytes(func)
+      returns the peak memory allocated while running func
+  '''
+  db.session.expunge_all()
+  tracemalloc.start()
+  try:
+    func()
+    return tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+    db.session.remove()
+
+
+def main(artists=100000):
+  setup_database()
+  seed(venues=1000, areas=100, artists=artists, shows=10000)
+  client = app.test_client()
+
+  def full_models():
+    # the previous implementation loaded every column of every artist
+    with app.test_request_context('/artists'):
+      render_template('pages/artists.html', artists=Artist.query.options(PROFILE).all(), filters={}, args={}, sort='name')
+
+  def listing():
+    cache.clear()
+    client.get('/artists')
+
+  print('{} artists'.format(artists))
+  for label, func, rows in [
+      ('full models', lambda: Artist.query.options(PROFILE).all(), artists),
+      ('deferred profile', lambda: Artist.query.all(), artists),
+      ('listing projection', lambda: get_listing(Artist).all(), artists),
+      ('full models, rendered', full_models, artists),
+      ('GET /artists (one page)', listing, ARTISTS_PER_PAGE)]:
+    measure(label, func, repeat=1)
+    peak = peak_bytes(func)
+    print('{:<40} {:>10.1f} MB {:>8.0f} bytes/row'.format('', peak / 2 ** 20, peak / rows))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:]])
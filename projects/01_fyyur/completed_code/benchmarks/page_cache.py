@@ -0,0 +1,30 @@
+#----------------------------------------------------------------------------#
+# Venue, artist and listing pages: rendered per request vs. the page cache.
+#
+#   python -m benchmarks.page_cache [venues] [shows]
+#----------------------------------------------------------------------------#
+
+import sys
+
+from app import app, cache
+from benchmarks import setup_database, seed, measure
+
+
+def main(venues=10000, shows=100000):
+  setup_database()
+  seed(venues=venues, areas=venues // 10, artists=venues, shows=shows)
+  client = app.test_client()
+
+  print('{} venues and artists, {} shows'.format(venues, shows))
+  for path in ['/venues', '/artists', '/venues/1', '/artists/1']:
+    def uncached():
+      cache.clear()
+      client.get(path)
+
+    measure('GET {} (rendered)'.format(path), uncached)
+    measure('GET {} (cached)'.format(path), lambda: client.get(path))
+  print(cache.stats())
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:]])
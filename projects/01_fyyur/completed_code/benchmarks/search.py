@@ -0,0 +1,34 @@
+#----------------------------------------------------------------------------#
+# Venue search: name ILIKE '%term%' vs. the search module.
+#
+#   python -m benchmarks.search [venues]
+#
+# On SQLite both paths scan the table; run it with BENCHMARK_DATABASE_URL set
+# to a Postgres database to measure the full-text and trigram indexes.
+#----------------------------------------------------------------------------#
+
+import sys
+
+from app import app, db, Venue
+from benchmarks import setup_database, seed, measure
+from search import search
+
+SEARCH_TERMS = ['venue 4242', 'city 7', 'jazz', 'ca']
+
+
+def main(venues=1000000):
+  setup_database()
+  seed(venues=venues, areas=1000, artists=1, shows=0)
+
+  print('{} venues'.format(venues))
+  with app.app_context():
+    db.session.execute(db.text('ANALYZE'))
+    for term in SEARCH_TERMS:
+      measure('ilike "{}"'.format(term),
+        lambda: Venue.query.filter(Venue.name.ilike('%{}%'.format(term))).all())
+      measure('search "{}"'.format(term),
+        lambda: search(Venue.query, Venue, term))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,37 @@
+#----------------------------------------------------------------------------#
+# Show booking: scanning a venue's shows vs. the indexed conflict check.
+#
+#   python -m benchmarks.show_conflicts [shows] [venues]
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime, timedelta
+
+from app import app, db, Venue, Artist, get_conflicting_shows, get_free_slots
+from benchmarks import setup_database, seed, measure
+
+
+def scan_conflicts(venue_id, artist_id, start_time):
+  # the naive check: load every show of the venue and the artist and compare
+  duration = app.config['SHOW_DURATION']
+  shows = Venue.query.get(venue_id).shows + Artist.query.get(artist_id).shows
+  return [show for show in shows if abs(show.start_time - start_time) < duration]
+
+
+def main(shows=1000000, venues=100):
+  setup_database()
+  seed(venues=venues, areas=10, artists=venues, shows=shows, batch_size=50000)
+  start_time = datetime.now() + timedelta(days=30)
+
+  print('{} shows at {} venues'.format(shows, venues))
+  with app.app_context():
+    for check in (scan_conflicts, get_conflicting_shows):
+      def run():
+        check(1, 1, start_time)
+        db.session.remove()
+      measure(check.__name__, run)
+    measure('get_free_slots (one week)', lambda: get_free_slots(1, start_time, start_time + timedelta(days=7)))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,51 @@
+#----------------------------------------------------------------------------#
+# /venues area listing: per-area queries vs. a single grouped query.
+#
+#   python -m benchmarks.venues [venues] [areas]
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+from flask import render_template
+
+from app import app, db, cache, Venue, Show
+from benchmarks import setup_database, seed, measure
+
+
+def per_area_queries():
+  # the previous implementation: one query for the areas, then one query per
+  # area (plus one per venue to count its upcoming shows) while rendering
+  data = []
+  for area in db.session.query(Venue.city, Venue.state).distinct().all():
+    venues = Venue.query.filter_by(city=area.city, state=area.state)
+    data.append({
+      'city': area.city,
+      'state': area.state,
+      'venues': [{
+        'id': venue.id,
+        'name': venue.name,
+        'num_upcoming_shows': Show.query.filter(Show.venue_id == venue.id, Show.start_time > datetime.now()).count()
+      } for venue in venues]
+    })
+  return render_template('pages/venues.html', areas=data)
+
+
+def grouped_query(client):
+  # a new venue version misses the page cache, so every run queries and renders
+  cache.bump('venue')
+  return client.get('/venues')
+
+
+def main(venues=10000, areas=1000):
+  setup_database()
+  seed(venues=venues, areas=areas, artists=1000, shows=venues * 5)
+  client = app.test_client()
+
+  print('{} venues across {} areas'.format(venues, areas))
+  with app.test_request_context('/venues'):
+    measure('per-area queries', per_area_queries, repeat=1)
+  measure('grouped query (GET /venues)', lambda: grouped_query(client))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,150 @@
+#----------------------------------------------------------------------------#
+# Cache.
+#
+# A small cache for data that is read on every request but rarely written,
+# such as the home page panels and rendered page fragments. Values live in
+# process memory by default, within a byte budget enforced by evicting the
+# least recently used entries;
+# any object with get/set/delete/clear methods (e.g. a wrapper around Redis)
+# can be plugged in as the backend through the CACHE_BACKEND setting so that
+# invalidations are shared between workers.
+#----------------------------------------------------------------------------#
+
+import sys
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+def sizeof(value):
+  # approximate footprint of the strings, dicts and lists that are cached
+  size = sys.getsizeof(value)
+  if isinstance(value, dict):
+    size += sum(sizeof(key) + sizeof(item) for key, item in value.items())
+  elif isinstance(value, (list, tuple)):
+    size += sum(sizeof(item) for item in value)
+  return size
+
+
+class MemoryBackend:
+  '''
+  MemoryBackend
+      a thread-safe in-process dict with per-key expiry; with max_bytes set,
+      the least recently used entries are evicted to stay within the budget
+  '''
+  def __init__(self, max_bytes=None):
+    self.values = OrderedDict()
+    self.lock = Lock()
+    self.max_bytes = max_bytes
+    self.bytes = 0
+    self.evictions = 0
+
+  def get(self, key):
+    with self.lock:
+      value, expires, size = self.values.get(key, (None, None, 0))
+      if expires is not None and expires < time.monotonic():
+        self._remove(key)
+        return None
+      if key in self.values:
+        self.values.move_to_end(key)
+      return value
+
+  def set(self, key, value, timeout=None):
+    size = sizeof(value)
+    with self.lock:
+      self._remove(key)
+      if self.max_bytes and size > self.max_bytes:
+        return
+      self.values[key] = (value, time.monotonic() + timeout if timeout else None, size)
+      self.bytes += size
+      while self.max_bytes and self.bytes > self.max_bytes:
+        self._remove(next(iter(self.values)))
+        self.evictions += 1
+
+  def delete(self, key):
+    with self.lock:
+      self._remove(key)
+
+  def clear(self):
+    with self.lock:
+      self.values.clear()
+      self.bytes = 0
+
+  def _remove(self, key):
+    if key in self.values:
+      self.bytes -= self.values.pop(key)[2]
+
+
+class Cache:
+  '''
+  Cache
+      read-through cache over a backend, counting hits and misses
+  '''
+  def __init__(self, backend=None, default_timeout=300):
+    self.backend = backend or MemoryBackend()
+    self.default_timeout = default_timeout
+    self.hits = 0
+    self.misses = 0
+
+  def init_app(self, app):
+    self.backend = app.config.get('CACHE_BACKEND') or MemoryBackend(app.config.get('CACHE_MAX_BYTES'))
+    self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', self.default_timeout)
+
+  def get_or_set(self, key, func, timeout=None):
+    # None is never cached, so func must return a value for misses to be stored
+    value = self.backend.get(key)
+    if value is not None:
+      self.hits += 1
+      return value
+
+    self.misses += 1
+    value = func()
+    self.backend.set(key, value, timeout or self.default_timeout)
+    return value
+
+  def delete(self, *keys):
+    for key in keys:
+      self.backend.delete(key)
+
+  def clear(self):
+    self.backend.clear()
+
+  def version(self, *parts):
+    '''
+    version(*parts)
+        returns the version stamp of e.g. ('venue', 1), to be used in the keys
+        of values derived from it
+    '''
+    key = 'version:' + ':'.join(map(str, parts))
+    value = self.backend.get(key)
+    if value is None:
+      # a fresh stamp, so an evicted version never matches stale keys again
+      value = time.time_ns()
+      self.backend.set(key, value)
+    return value
+
+  def bump(self, *parts):
+    # values keyed on the previous version are never read again and age out
+    self.backend.set('version:' + ':'.join(map(str, parts)), time.time_ns())
+
+  def stats(self):
+    stats = {'hits': self.hits, 'misses': self.misses}
+    for name in ('bytes', 'evictions'):
+      if hasattr(self.backend, name):
+        stats[name] = getattr(self.backend, name)
+    return stats
+
+
+def cache_metrics(cache):
+  '''
+  cache_metrics(cache)
+      yields (name, type, help, value) for the lookups of a Cache and, with
+      the memory backend, its size and evictions
+  '''
+  stats = cache.stats()
+  yield 'fyyur_cache_hits_total', 'counter', 'Cache lookups that found a value.', stats['hits']
+  yield 'fyyur_cache_misses_total', 'counter', 'Cache lookups that computed the value.', stats['misses']
+  if 'bytes' in stats:
+    yield 'fyyur_cache_bytes', 'gauge', 'Approximate size of the cached values.', stats['bytes']
+  if 'evictions' in stats:
+    yield 'fyyur_cache_evictions_total', 'counter', 'Values evicted to stay within CACHE_MAX_BYTES.', stats['evictions']
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -7,5 +8,36 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgres://dkaminsky@localhost:5432/fyuur'
-SQLALCHEMY_TRACK_MODIFICATIONS = True
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://dkaminsky@localhost:5432/fyuur')
+# Change tracking is only needed for Flask-SQLAlchemy's model signals, which Fyyur does not use
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool of each process (see pool.py); not applied to SQLite.
+# Connections kept open, and opened on top of those under load
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Seconds after which a connection is replaced, below any server or proxy idle timeout
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# Test connections before use, so connections dropped by a database restart are replaced
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1').lower() not in ('0', 'false', 'no')
+# Milliseconds after which Postgres cancels a statement; 0 disables the limit
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+
+# Cache for rarely changing data, e.g. the home page panels (see cache.py).
+# Set CACHE_BACKEND to an object with get/set/delete/clear to share it between workers.
+CACHE_BACKEND = None
+CACHE_DEFAULT_TIMEOUT = 300
+# Memory budget of the in-process cache, least recently used entries are evicted first
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Rendered venue, artist and listing pages; the timeout bounds how long a show
+# is still listed as upcoming after it started
+PAGE_CACHE_TIMEOUT = 60
+
+# How long a show occupies its venue and artist; overlapping bookings are rejected
+SHOW_DURATION = timedelta(hours=3)
+
+# Requests taking at least this many seconds are logged with their query and
+# render times; None disables the log
+SLOW_REQUEST_THRESHOLD = 1.0
@@ -0,0 +1,53 @@
+#----------------------------------------------------------------------------#
+# Export helpers.
+#
+# Used by the "flask export" command and the export endpoints in app.py:
+# rows streamed from the database are written out as CSV or JSON lines a
+# batch at a time, so an export of any size runs in constant memory. The
+# output uses the column names and formats accepted by "flask import".
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from importer import batched
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def export_value(value, format):
+  # datetimes use the format of the forms, lists the comma separated form in CSV
+  if isinstance(value, datetime):
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+  if isinstance(value, list) and format == 'csv':
+    return ','.join(value)
+  return value
+
+
+def write_rows(rows, columns, format='csv', batch_size=1000):
+  '''
+  write_rows(rows, columns, format='csv', batch_size=1000)
+      yields the given columns of rows (mappings) as chunks of a CSV file
+      with a header row, or of a JSON lines file
+  '''
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  if format == 'csv':
+    writer.writerow(columns)
+
+  for batch in batched(rows, batch_size):
+    for row in batch:
+      values = [export_value(row[column], format) for column in columns]
+      if format == 'csv':
+        writer.writerow(values)
+      else:
+        buffer.write(json.dumps(dict(zip(columns, values))) + '\n')
+
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+  if format == 'csv' and buffer.tell():
+    yield buffer.getvalue()
@@ -1,14 +1,14 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, URL, Length, Regexp
+from wtforms.validators import DataRequired, URL, Length, Optional, Regexp
 
 class ShowForm(FlaskForm):
     artist_id = StringField(
-        'artist_id'
+        'artist_id', validators=[DataRequired(), Regexp(r'^[0-9]+$', message='Must be an ID.')]
     )
     venue_id = StringField(
-        'venue_id'
+        'venue_id', validators=[DataRequired(), Regexp(r'^[0-9]+$', message='Must be an ID.')]
     )
     start_time = DateTimeField(
         'start_time',
@@ -83,10 +83,10 @@ class VenueForm(FlaskForm):
         'address', validators=[DataRequired(), Length(max=200)]
     )
     phone = StringField(
-        'phone', validators=[Regexp(r'^[0-9\-\+]+$'), Length(max=50)]
+        'phone', validators=[Optional(), Regexp(r'^[0-9\-\+]+$'), Length(max=50)]
     )
     image_link = StringField(
-        'image_link', validators=[URL(), Length(max=500)]
+        'image_link', validators=[Optional(), URL(), Length(max=500)]
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
@@ -113,7 +113,7 @@ class VenueForm(FlaskForm):
         ]
     )
     facebook_link = StringField(
-        'facebook_link', validators=[URL()]
+        'facebook_link', validators=[Optional(), URL()]
     )
 
 class ArtistForm(FlaskForm):
@@ -180,10 +180,10 @@ class ArtistForm(FlaskForm):
         ]
     )
     phone = StringField(
-        'phone', validators=[Regexp(r'^[0-9\-\+]+$'), Length(max=50)]
+        'phone', validators=[Optional(), Regexp(r'^[0-9\-\+]+$'), Length(max=50)]
     )
     image_link = StringField(
-        'image_link', validators=[URL(), Length(max=500)]
+        'image_link', validators=[Optional(), URL(), Length(max=500)]
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
@@ -210,5 +210,5 @@ class ArtistForm(FlaskForm):
         ]
     )
     facebook_link = StringField(
-        'facebook_link', validators=[URL()]
+        'facebook_link', validators=[Optional(), URL()]
     )
@@ -0,0 +1,25 @@
+#----------------------------------------------------------------------------#
+# Genres column.
+#
+# Venues and artists keep their genres in the genre tables and, for search
+# and older rows, as the text of a Postgres array literal in their genres
+# column, e.g. '{Jazz,"Rock n Roll"}'. The app and the migration that filled
+# the genre tables read that text with the same parser.
+#----------------------------------------------------------------------------#
+
+import csv
+import re
+
+# names that Postgres quotes in an array literal
+NEEDS_QUOTES = re.compile(r'[{},"\\]|^\s|\s$|^$|^null$', re.IGNORECASE)
+
+
+def genres_column(names):
+  return '{' + ','.join('"{}"'.format(name.replace('\\', '\\\\').replace('"', '\\"'))
+    if NEEDS_QUOTES.search(name) else name for name in names) + '}'
+
+
+def parse_genres_column(value):
+  # the names of an array literal, unquoted and unescaped
+  fields = next(csv.reader([(value or '').strip('{}')], escapechar='\\', doublequote=False), [])
+  return [name.strip() for name in fields if name.strip()]
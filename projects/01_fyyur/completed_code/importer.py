@@ -0,0 +1,87 @@
+#----------------------------------------------------------------------------#
+# Bulk import helpers.
+#
+# Used by the "flask import" command in app.py: rows are streamed from a CSV
+# or JSON lines file, validated with the WTForms forms used by the web
+# handlers and handed back in batches, so a catalogue of any size is
+# imported with constant memory.
+#----------------------------------------------------------------------------#
+
+import csv
+import json
+import time
+from itertools import islice
+from werkzeug.datastructures import MultiDict
+
+
+def read_rows(file, format=None):
+  '''
+  read_rows(file, format=None)
+      yields (line_number, row) pairs from a CSV file with a header row or a
+      JSON lines file; the format defaults to the file extension
+  '''
+  if format is None:
+    format = 'jsonl' if getattr(file, 'name', '').endswith(('.jsonl', '.ndjson')) else 'csv'
+
+  if format == 'csv':
+    reader = csv.DictReader(file)
+    for row in reader:
+      yield reader.line_num, {key: value for key, value in row.items() if value not in (None, '')}
+  else:
+    for line_number, line in enumerate(file, 1):
+      if line.strip():
+        yield line_number, json.loads(line)
+
+
+def validate_row(form_class, row, multiple=()):
+  '''
+  validate_row(form_class, row, multiple=())
+      validates row with form_class and returns (data, errors). Optional
+      fields missing from the row are not validated; fields listed in
+      multiple accept a list or a comma separated string.
+  '''
+  items = []
+  for key, value in row.items():
+    if key in multiple:
+      values = value.split(',') if isinstance(value, str) else value
+      items.extend((key, item.strip()) for item in values)
+    else:
+      items.append((key, str(value)))
+
+  form = form_class(formdata=MultiDict(items), meta={'csrf': False})
+  for name in list(form._fields):
+    if name not in row and not form[name].flags.required:
+      del form[name]
+
+  if form.validate():
+    return form.data, None
+  return None, form.errors
+
+
+def batched(iterable, size):
+  iterator = iter(iterable)
+  while True:
+    batch = list(islice(iterator, size))
+    if not batch:
+      return
+    yield batch
+
+
+class ImportStats:
+  '''
+  ImportStats
+      counts imported and rejected rows and reports throughput
+  '''
+  def __init__(self):
+    self.imported = 0
+    self.rejected = 0
+    self.started = time.perf_counter()
+
+  @property
+  def elapsed(self):
+    return time.perf_counter() - self.started
+
+  def report(self, kind):
+    rate = self.imported / self.elapsed if self.elapsed else 0
+    return 'Imported {} {} in {:.1f}s ({:.0f} rows/s, {:.0f} rows/min), {} rejected'.format(
+      self.imported, kind, self.elapsed, rate, rate * 60, self.rejected)
@@ -0,0 +1,105 @@
+#----------------------------------------------------------------------------#
+# Metrics.
+#
+# Request metrics collected by the hooks in app.py (wall time, SQL statements
+# and time, template render time per endpoint), plus the values of registered
+# collectors such as the connection pool, served at /metrics in the
+# Prometheus text format. Values are kept per process, so each gunicorn
+# worker is scraped (or reports) separately.
+#----------------------------------------------------------------------------#
+
+from collections import defaultdict
+from threading import Lock
+
+# upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+
+def format_labels(labels):
+  return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+    for name, value in labels) + '}' if labels else ''
+
+
+class Histogram:
+  '''
+  Histogram(buckets)
+      cumulative bucket counts, sum and count of the observed values
+  '''
+  def __init__(self, buckets):
+    self.buckets = buckets
+    self.counts = [0] * len(buckets)
+    self.sum = 0
+    self.count = 0
+
+  def observe(self, value):
+    for i, bound in enumerate(self.buckets):
+      if value <= bound:
+        self.counts[i] += 1
+    self.sum += value
+    self.count += 1
+
+  def samples(self, name, labels):
+    for bound, count in zip(self.buckets, self.counts):
+      yield name + '_bucket', labels + (('le', bound),), count
+    yield name + '_bucket', labels + (('le', '+Inf'),), self.count
+    yield name + '_sum', labels, self.sum
+    yield name + '_count', labels, self.count
+
+
+class Metrics:
+  '''
+  Metrics
+      thread-safe counters and histograms of the requests served by this
+      process, rendered in the Prometheus text format
+  '''
+  def __init__(self):
+    self.lock = Lock()
+    self.requests = defaultdict(int)
+    # name: (help, histograms by labels)
+    self.histograms = {
+      'fyyur_request_duration_seconds': ('Wall time per request.', defaultdict(lambda: Histogram(SECONDS_BUCKETS))),
+      'fyyur_request_sql_queries': ('SQL statements per request.', defaultdict(lambda: Histogram(QUERIES_BUCKETS))),
+      'fyyur_request_sql_seconds': ('SQL time per request.', defaultdict(lambda: Histogram(SECONDS_BUCKETS))),
+      'fyyur_request_render_seconds': ('Template render time per request.', defaultdict(lambda: Histogram(SECONDS_BUCKETS))),
+    }
+    self.collectors = []
+
+  def observe_request(self, endpoint, method, status, duration, sql_queries, sql_time, render_time):
+    labels = (('endpoint', endpoint), ('method', method))
+    with self.lock:
+      self.requests[labels + (('status', status),)] += 1
+      for name, value in (('fyyur_request_duration_seconds', duration), ('fyyur_request_sql_queries', sql_queries),
+          ('fyyur_request_sql_seconds', sql_time), ('fyyur_request_render_seconds', render_time)):
+        self.histograms[name][1][labels].observe(value)
+
+  def collector(self, func):
+    '''
+    collector(func)
+        registers func, which yields (name, type, help, value) of metrics
+        read at every scrape; usable as a decorator
+    '''
+    self.collectors.append(func)
+    return func
+
+  def render(self):
+    lines = []
+    with self.lock:
+      lines.append('# HELP fyyur_requests_total Requests served.')
+      lines.append('# TYPE fyyur_requests_total counter')
+      for labels, count in sorted(self.requests.items()):
+        lines.append('fyyur_requests_total{} {}'.format(format_labels(labels), count))
+
+      for name, (help, histograms) in self.histograms.items():
+        lines.append('# HELP {} {}'.format(name, help))
+        lines.append('# TYPE {} histogram'.format(name))
+        for labels, histogram in sorted(histograms.items()):
+          for sample, sample_labels, value in histogram.samples(name, labels):
+            lines.append('{}{} {}'.format(sample, format_labels(sample_labels), value))
+
+    for collect in self.collectors:
+      for name, type, help, value in collect():
+        lines.append('# HELP {} {}'.format(name, help))
+        lines.append('# TYPE {} {}'.format(name, type))
+        lines.append('{} {}'.format(name, value))
+    return '\n'.join(lines) + '\n'
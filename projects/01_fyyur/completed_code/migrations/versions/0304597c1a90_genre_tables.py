@@ -0,0 +1,69 @@
+"""Normalize venue and artist genres into association tables.
+
+Revision ID: 0304597c1a90
+Revises: 5fc6117ff4f4
+Create Date: 2026-10-18 10:41:27.503918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from genres import parse_genres_column
+
+
+# revision identifiers, used by Alembic.
+revision = '0304597c1a90'
+down_revision = '5fc6117ff4f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('artist_genres',
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.PrimaryKeyConstraint('genre_id', 'artist_id')
+    )
+    op.create_index(op.f('ix_artist_genres_artist_id'), 'artist_genres', ['artist_id'], unique=False)
+    op.create_table('venue_genres',
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('genre_id', 'venue_id')
+    )
+    op.create_index(op.f('ix_venue_genres_venue_id'), 'venue_genres', ['venue_id'], unique=False)
+
+    # backfill the association tables from the genres column
+    connection = op.get_bind()
+    links = {}
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        rows = connection.execute(sa.text('SELECT id, genres FROM "{}"'.format(table)))
+        links[table, key] = [(row[0], name) for row in rows for name in parse_genres_column(row[1])]
+
+    names = sorted({name for rows in links.values() for _, name in rows})
+    if names:
+        op.bulk_insert(genre, [{'name': name} for name in names])
+
+    genre_ids = dict((name, id) for id, name in connection.execute(sa.text('SELECT id, name FROM "Genre"')))
+    for (table, key), rows in links.items():
+        association = sa.table(table.lower() + '_genres', sa.column('genre_id'), sa.column(key))
+        rows = set((genre_ids[name], id) for id, name in rows)
+        if rows:
+            op.bulk_insert(association, [{'genre_id': genre_id, key: id} for genre_id, id in rows])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_venue_genres_venue_id'), table_name='venue_genres')
+    op.drop_table('venue_genres')
+    op.drop_index(op.f('ix_artist_genres_artist_id'), table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_table('Genre')
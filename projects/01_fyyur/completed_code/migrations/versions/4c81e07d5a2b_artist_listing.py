@@ -0,0 +1,35 @@
+"""Index artists for the paginated listing.
+
+Revision ID: 4c81e07d5a2b
+Revises: b2d6f1a3c9e8
+Create Date: 2026-10-18 14:22:35.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c81e07d5a2b'
+down_revision = 'b2d6f1a3c9e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # artists listed before created_at was added sort as the oldest ones
+    op.execute('UPDATE "Artist" SET created_at = (SELECT COALESCE(MIN(created_at), CURRENT_TIMESTAMP) FROM "Artist") '
+               'WHERE created_at IS NULL')
+    with op.batch_alter_table('Artist') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.drop_index('ix_Artist_created_at', table_name='Artist')
+    op.create_index('ix_Artist_created_at_id', 'Artist', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_created_at_id', table_name='Artist')
+    op.create_index('ix_Artist_created_at', 'Artist', ['created_at'], unique=False)
+
+    with op.batch_alter_table('Artist') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
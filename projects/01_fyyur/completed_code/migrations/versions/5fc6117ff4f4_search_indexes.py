@@ -0,0 +1,39 @@
+"""Full-text and trigram search indexes for venues and artists.
+
+Revision ID: 5fc6117ff4f4
+Revises: 993336a25e8a
+Create Date: 2026-10-18 09:12:04.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5fc6117ff4f4'
+down_revision = '993336a25e8a'
+branch_labels = None
+depends_on = None
+
+# must match search_document() in search.py for the planner to use the index
+SEARCH_DOCUMENT = "to_tsvector('simple', name || ' ' || city || ' ' || state || ' ' || genres)"
+
+
+def upgrade():
+    # tsvector and pg_trgm indexes only exist on Postgres; other databases use the LIKE fallback
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        op.execute('CREATE INDEX "ix_{0}_search" ON "{0}" USING gin ({1})'.format(table, SEARCH_DOCUMENT))
+        op.execute('CREATE INDEX "ix_{0}_name_trgm" ON "{0}" USING gin (name gin_trgm_ops)'.format(table))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_search'.format(table), table_name=table)
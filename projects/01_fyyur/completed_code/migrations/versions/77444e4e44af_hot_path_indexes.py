@@ -0,0 +1,45 @@
+"""Indexes for the show, venue and artist hot paths.
+
+Revision ID: 77444e4e44af
+Revises: 0304597c1a90
+Create Date: 2026-10-18 12:03:51.270184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '77444e4e44af'
+down_revision = '0304597c1a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # shows without a venue or an artist cannot be listed anywhere
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('venue_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('artist_id', existing_type=sa.Integer(), nullable=False)
+
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_Venue_state_city_name', 'Venue', ['state', 'city', 'name'], unique=False)
+    op.create_index('ix_Venue_created_at', 'Venue', ['created_at'], unique=False)
+    op.create_index('ix_Artist_state_city_name', 'Artist', ['state', 'city', 'name'], unique=False)
+    op.create_index('ix_Artist_created_at', 'Artist', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_created_at', table_name='Artist')
+    op.drop_index('ix_Artist_state_city_name', table_name='Artist')
+    op.drop_index('ix_Venue_created_at', table_name='Venue')
+    op.drop_index('ix_Venue_state_city_name', table_name='Venue')
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('artist_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('venue_id', existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,50 @@
+"""Keep upcoming and past show counters on venues and artists.
+
+Revision ID: 9e3f52c1b7d4
+Revises: 4c81e07d5a2b
+Create Date: 2026-10-18 15:37:12.604721
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3f52c1b7d4'
+down_revision = '4c81e07d5a2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    show_counts = op.create_table('ShowCounts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('counted_until', sa.DateTime(timezone=False), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # the app compares show times with its local clock, not the database's
+    now = datetime.now()
+    op.bulk_insert(show_counts, [{'id': 1, 'counted_until': now}])
+
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+        count = 'SELECT COUNT(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time {op} :now'
+        op.get_bind().execute(sa.text(
+            'UPDATE "{table}" SET upcoming_shows_count = ({upcoming}), past_shows_count = ({past})'.format(
+                table=table,
+                upcoming=count.format(key=key, table=table, op='>'),
+                past=count.format(key=key, table=table, op='<='))),
+            {'now': now})
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
+
+    op.drop_table('ShowCounts')
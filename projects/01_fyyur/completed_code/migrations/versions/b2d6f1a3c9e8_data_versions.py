@@ -0,0 +1,29 @@
+"""Keep a version of the venues, artists and shows for the API's ETags.
+
+Revision ID: b2d6f1a3c9e8
+Revises: 77444e4e44af
+Create Date: 2026-10-18 13:41:07.512903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d6f1a3c9e8'
+down_revision = '77444e4e44af'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    data_version = op.create_table('DataVersion',
+        sa.Column('name', sa.String(length=20), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(data_version, [{'name': name, 'version': 0} for name in ('venue', 'artist', 'show')])
+
+
+def downgrade():
+    op.drop_table('DataVersion')
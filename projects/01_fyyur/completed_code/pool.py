@@ -0,0 +1,80 @@
+#----------------------------------------------------------------------------#
+# Connection pool.
+#
+# Engine options for server databases, built from the DB_* settings of
+# config.py, and a QueuePool that counts checkouts, the time spent waiting
+# for a connection and checkout timeouts. The pool is per process: under
+# gunicorn each worker opens up to DB_POOL_SIZE + DB_MAX_OVERFLOW
+# connections, which together must stay below Postgres' max_connections.
+#----------------------------------------------------------------------------#
+
+import time
+from threading import Lock
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+  '''
+  TimedQueuePool(creator, **options)
+      QueuePool recording the number of checkouts, the time spent obtaining
+      a connection (waiting for a free one or opening a new one) and the
+      number of checkouts that timed out
+  '''
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.stats_lock = Lock()
+    self.checkouts = 0
+    self.wait_time = 0
+    self.timeouts = 0
+
+  def _do_get(self):
+    start = time.perf_counter()
+    timed_out = False
+    try:
+      return super()._do_get()
+    except exc.TimeoutError:
+      timed_out = True
+      raise
+    finally:
+      with self.stats_lock:
+        self.checkouts += 1
+        self.wait_time += time.perf_counter() - start
+        self.timeouts += timed_out
+
+
+def engine_options(config, backend):
+  '''
+  engine_options(config, backend)
+      returns the create_engine options for a server database from the
+      DB_* settings
+  '''
+  options = {
+    'poolclass': TimedQueuePool,
+    'pool_size': config['DB_POOL_SIZE'],
+    'max_overflow': config['DB_MAX_OVERFLOW'],
+    'pool_timeout': config['DB_POOL_TIMEOUT'],
+    'pool_recycle': config['DB_POOL_RECYCLE'],
+    'pool_pre_ping': config['DB_POOL_PRE_PING'],
+  }
+  if backend == 'postgresql' and config['DB_STATEMENT_TIMEOUT']:
+    options['connect_args'] = {'options': '-c statement_timeout={:d}'.format(config['DB_STATEMENT_TIMEOUT'])}
+  return options
+
+
+def pool_metrics(pool):
+  '''
+  pool_metrics(pool)
+      yields (name, type, help, value) for the current state of a
+      TimedQueuePool
+  '''
+  with pool.stats_lock:
+    checkouts, wait_time, timeouts = pool.checkouts, pool.wait_time, pool.timeouts
+
+  yield 'fyyur_db_pool_size', 'gauge', 'Connections kept open by the pool.', pool.size()
+  yield 'fyyur_db_pool_checked_out', 'gauge', 'Connections in use.', pool.checkedout()
+  yield 'fyyur_db_pool_idle', 'gauge', 'Open connections waiting in the pool.', pool.checkedin()
+  yield 'fyyur_db_pool_overflow', 'gauge', 'Connections open beyond the pool size.', max(pool.overflow(), 0)
+  yield 'fyyur_db_pool_checkouts_total', 'counter', 'Connections taken from the pool.', checkouts
+  yield 'fyyur_db_pool_wait_seconds_total', 'counter', 'Time spent obtaining connections.', wait_time
+  yield 'fyyur_db_pool_timeouts_total', 'counter', 'Checkouts that gave up after DB_POOL_TIMEOUT.', timeouts
@@ -0,0 +1,70 @@
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Venues and artists are searched on a single document built from their name,
+# city, state and genres. On Postgres the document is matched with prefix
+# full-text queries backed by a GIN index on its tsvector, plus a trigram
+# index on name for substring matches. Other databases (e.g. SQLite for
+# local development) fall back to case-insensitive LIKE matching.
+#----------------------------------------------------------------------------#
+
+import re
+from sqlalchemy import DDL, and_, event, func, literal_column, or_
+
+SEARCH_RESULTS_LIMIT = 50
+
+# must stay in sync with the index expressions in the search migration
+SEARCH_INDEXES = [
+  'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+  'CREATE INDEX "ix_{table}_search" ON "{table}" USING gin '
+  "(to_tsvector('simple', name || ' ' || city || ' ' || state || ' ' || genres))",
+  'CREATE INDEX "ix_{table}_name_trgm" ON "{table}" USING gin (name gin_trgm_ops)',
+]
+
+
+def register_search_indexes(model):
+  '''
+  register_search_indexes(model)
+      creates the Postgres search indexes whenever db.create_all() creates
+      the model's table; migrated databases get them from the migration
+  '''
+  for statement in SEARCH_INDEXES:
+    ddl = DDL(statement.format(table=model.__tablename__)).execute_if(dialect='postgresql')
+    event.listen(model.__table__, 'after_create', ddl)
+
+
+def search_document(model):
+  space = literal_column("' '")
+  return model.name + space + model.city + space + model.state + space + model.genres
+
+
+def search_tokens(search_term):
+  return re.findall(r'[^\W_]+', search_term.lower())
+
+
+def search(query, model, search_term, limit=SEARCH_RESULTS_LIMIT):
+  '''
+  search(query, model, search_term)
+      returns (results, count) for the best matching rows of query; every
+      word of search_term must match the start of a word in the name, city,
+      state or genres (any substring of them outside Postgres)
+  '''
+  tokens = search_tokens(search_term)
+  if not tokens:
+    return query.order_by(model.name).limit(limit).all(), query.count()
+
+  if query.session.get_bind().dialect.name == 'postgresql':
+    config = literal_column("'simple'")
+    document = func.to_tsvector(config, search_document(model))
+    tsquery = func.to_tsquery(config, ' & '.join(token + ':*' for token in tokens))
+    term = ' '.join(tokens)
+
+    query = query.filter(or_(document.op('@@')(tsquery), model.name.ilike('%' + term + '%')))
+    ranking = (func.ts_rank(document, tsquery) + func.similarity(model.name, term)).desc()
+  else:
+    document = search_document(model)
+
+    query = query.filter(and_(*[document.ilike('%' + token + '%') for token in tokens]))
+    ranking = model.name.ilike(tokens[0] + '%').desc()
+
+  return query.order_by(ranking, model.name).limit(limit).all(), query.count()
@@ -0,0 +1,353 @@
+import json
+import os
+import unittest
+from datetime import datetime
+from sqlalchemy import event, text
+
+from app import app, db, cache, refresh_show_counts, rebuild_show_counts, Artist, Show, ShowCounts, Venue
+
+# the engine is created on first use, so the test database must be set up front
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+app.config['WTF_CSRF_ENABLED'] = False
+
+from benchmarks import seed
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Asserts that the queries behind the hot routes are served by indexes"""
+
+    @classmethod
+    def setUpClass(cls):
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+        seed(venues=200, areas=20, artists=200, shows=2000)
+
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.drop_all()
+
+    def setUp(self):
+        self.client = app.test_client
+        cache.clear()
+
+    def record_statements(self, func):
+        """Runs func and returns the SELECT statements it executed"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        engine = db.get_engine(app)
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            func()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        return [statement for statement in statements if statement[0].lstrip().upper().startswith('SELECT')]
+
+    def get_statements(self, path, data=None):
+        """Requests path (POSTing data if given) and returns the SQL statements it executed"""
+        responses = []
+        statements = self.record_statements(lambda: responses.append(
+            self.client().post(path, data=data) if data else self.client().get(path)))
+
+        self.assertEqual(responses[0].status_code, 200)
+        return statements
+
+    def explain(self, statement, parameters):
+        """Returns the query plan of a statement, one line per plan node"""
+        with db.get_engine(app).connect() as connection:
+            if connection.dialect.name == 'postgresql':
+                # tiny tables are always cheaper to scan, so make Postgres show the index it would use
+                connection.exec_driver_sql('SET enable_seqscan = off')
+                rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters)
+                return [row[0] for row in rows]
+
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+            return [row[-1] for row in rows]
+
+    def assertUsesIndex(self, path, table, index=None, data=None):
+        """Asserts that every statement of path touching table reads it through an index"""
+        lines = []
+        for statement, parameters in self.get_statements(path, data):
+            if '"{}"'.format(table) in statement or ' {}.'.format(table) in statement:
+                lines.extend(self.explain(statement, parameters))
+
+        self.assertTrue(lines, 'no query on {} for {}'.format(table, path))
+        if index:
+            self.assertTrue(any(index in line for line in lines), '{} not used for {}'.format(index, path))
+        for line in lines:
+            if db.get_engine(app).dialect.name == 'postgresql':
+                self.assertNotIn('Seq Scan on "{}"'.format(table), line, path)
+            else:
+                self.assertNotRegex(line, r'^SCAN "?{}"?$'.format(table), path)
+
+    def test_index_recent_venues(self):
+        self.assertUsesIndex('/', 'Venue', 'ix_Venue_created_at')
+
+    def test_index_recent_artists(self):
+        self.assertUsesIndex('/', 'Artist', 'ix_Artist_created_at')
+
+    def test_venues_areas(self):
+        # upcoming show counts come from Venue.upcoming_shows_count, so /venues only reads venues
+        self.assertUsesIndex('/venues', 'Venue', 'ix_Venue_state_city_name')
+
+    def test_refresh_show_counts(self):
+        def refresh():
+            with app.app_context():
+                refresh_show_counts()
+                db.session.rollback()
+
+        lines = [line for statement, parameters in self.record_statements(refresh) if 'GROUP BY' in statement
+            for line in self.explain(statement, parameters)]
+        self.assertTrue(any('ix_Show_start_time_id' in line for line in lines), lines)
+
+    def test_venues_by_genre(self):
+        self.assertUsesIndex('/venues?genre=Jazz', 'venue_genres')
+
+    def test_artists_by_genre(self):
+        self.assertUsesIndex('/artists?genre=Jazz', 'artist_genres')
+
+    def test_artists_by_area(self):
+        self.assertUsesIndex('/artists?state=CA&city=City+1', 'Artist', 'ix_Artist_state_city_name')
+
+    def test_newest_artists_next_page(self):
+        self.assertUsesIndex('/artists?sort=created_at&cursor=2000-01-01T00:00:00_1', 'Artist', 'ix_Artist_created_at_id')
+
+    def test_show_venue_shows(self):
+        self.assertUsesIndex('/venues/1', 'Show', 'ix_Show_venue_id_start_time')
+
+    def test_show_artist_shows(self):
+        self.assertUsesIndex('/artists/1', 'Show', 'ix_Show_artist_id_start_time')
+
+    def test_export_shows(self):
+        self.assertUsesIndex('/api/v1/export/shows.csv?start=2030-01-01', 'Show', 'ix_Show_start_time_id')
+
+    def test_venue_free_slots(self):
+        self.assertUsesIndex('/api/v1/venues/1/free_slots?start=2030-01-01&end=2030-01-08', 'Show', 'ix_Show_venue_id_start_time')
+
+    def test_shows_page(self):
+        self.assertUsesIndex('/shows', 'Show', 'ix_Show_start_time_id')
+
+    def test_shows_next_page(self):
+        self.assertUsesIndex('/shows?cursor=2000-01-01T00:00:00_1', 'Show', 'ix_Show_start_time_id')
+
+    def test_upcoming_shows_page(self):
+        self.assertUsesIndex('/shows?upcoming=1', 'Show', 'ix_Show_start_time_id')
+
+    @unittest.skipUnless(db.get_engine(app).dialect.name == 'postgresql', 'search indexes are Postgres only')
+    def test_search_venues(self):
+        self.assertUsesIndex('/venues/search', 'Venue', 'ix_Venue_search', data={'search_term': 'jazz'})
+
+    @unittest.skipUnless(db.get_engine(app).dialect.name == 'postgresql', 'search indexes are Postgres only')
+    def test_search_artists(self):
+        self.assertUsesIndex('/artists/search', 'Artist', 'ix_Artist_search', data={'search_term': 'jazz'})
+
+
+
+class WriteTestCase(unittest.TestCase):
+    """Checks the behaviour of the write paths and what they invalidate"""
+
+    @classmethod
+    def setUpClass(cls):
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+        seed(venues=20, areas=2, artists=20, shows=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.drop_all()
+
+    def setUp(self):
+        self.client = app.test_client
+        cache.clear()
+        # the shows booked by the tests are upcoming
+        self.set_counted_until(datetime(2030, 1, 1))
+
+    def book(self, venue_id, artist_id, start_time):
+        res = self.client().post('/shows/create', follow_redirects=True,
+            data={'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time})
+        return res.get_data(as_text=True)
+
+    def count_shows(self, venue_id):
+        with app.app_context():
+            return Show.query.filter(Show.venue_id == venue_id).count()
+
+    def test_book_show_venue_conflict(self):
+        self.assertIn('Show was successfully listed!', self.book(2, 2, '2040-01-01 20:00:00'))
+        page = self.book(2, 3, '2040-01-01 22:00:00')
+        self.assertIn('Show could not be listed. Venue 2 is already booked at', page)
+        self.assertEqual(self.count_shows(2), 1)
+
+    def test_book_show_artist_conflict(self):
+        self.assertIn('Show was successfully listed!', self.book(4, 4, '2040-01-01 20:00:00'))
+        page = self.book(5, 4, '2040-01-01 18:00:00')
+        self.assertIn('Show could not be listed. Artist 4 is already playing at', page)
+        self.assertEqual(self.count_shows(5), 0)
+
+    def test_book_show_back_to_back(self):
+        # a show may start exactly when the previous one ends
+        duration = app.config['SHOW_DURATION']
+        first = datetime(2040, 1, 1, 18)
+        self.assertIn('Show was successfully listed!', self.book(6, 6, str(first)))
+        self.assertIn('Show was successfully listed!', self.book(6, 7, str(first + duration)))
+        self.assertIn('Show was successfully listed!', self.book(7, 6, str(first + 2 * duration)))
+        self.assertEqual(self.count_shows(6), 2)
+
+    def test_free_slots(self):
+        duration = app.config['SHOW_DURATION']
+        self.book(8, 8, '2040-02-01 10:00:00')
+        self.book(8, 9, str(datetime(2040, 2, 1, 10) + duration))
+        self.book(8, 10, '2040-02-01 20:00:00')
+        # leaves exactly one show's time before the next one
+        self.book(8, 11, str(datetime(2040, 2, 1, 10) - 2 * duration))
+
+        res = self.client().get('/api/v1/venues/8/free_slots?start=2040-02-01T00:00:00&end=2040-02-02T06:00:00')
+        self.assertEqual(res.get_json()['free_slots'], [
+            {'start': '2040-02-01T00:00:00', 'end': (datetime(2040, 2, 1, 10) - 2 * duration).isoformat()},
+            {'start': (datetime(2040, 2, 1, 10) - duration).isoformat(), 'end': '2040-02-01T10:00:00'},
+            {'start': (datetime(2040, 2, 1, 10) + 2 * duration).isoformat(), 'end': '2040-02-01T20:00:00'},
+            {'start': (datetime(2040, 2, 1, 20) + duration).isoformat(), 'end': '2040-02-02T06:00:00'},
+        ])
+
+    def get_counts(self, venue_id):
+        with app.app_context():
+            venue = db.session.get(Venue, venue_id)
+            return venue.upcoming_shows_count, venue.past_shows_count
+
+    def set_counted_until(self, counted_until):
+        with app.app_context():
+            db.session.query(ShowCounts).update({'counted_until': counted_until})
+            db.session.commit()
+
+    def set_counts(self, venue_id, upcoming, past):
+        with app.app_context():
+            db.session.query(Venue).filter(Venue.id == venue_id).update({
+                'upcoming_shows_count': upcoming, 'past_shows_count': past})
+            db.session.commit()
+
+    def test_show_counts_on_insert_and_delete(self):
+        self.set_counts(12, 0, 0)
+        self.book(12, 12, '2050-01-01 20:00:00')
+        self.assertEqual(self.get_counts(12), (1, 0))
+
+        with app.app_context():
+            show_id = db.session.query(Show.id).filter(Show.venue_id == 12).scalar()
+        self.client().delete('/shows/{}'.format(show_id))
+        self.assertEqual(self.get_counts(12), (0, 0))
+
+    def test_refresh_show_counts_moves_started_shows(self):
+        self.set_counts(13, 0, 0)
+        self.set_counted_until(datetime(2045, 1, 1))
+        self.book(13, 13, '2045-01-01 20:00:00')
+        self.assertEqual(self.get_counts(13), (1, 0))
+
+        now = datetime(2045, 1, 2)
+        with app.app_context():
+            self.assertEqual(refresh_show_counts(now), 1)
+            db.session.commit()
+            self.assertEqual(db.session.query(ShowCounts.counted_until).scalar(), now)
+        self.assertEqual(self.get_counts(13), (0, 1))
+
+    def test_rebuild_show_counts_repairs_drift(self):
+        self.book(14, 14, '2047-01-01 20:00:00')
+        self.set_counts(14, 5, 3)
+
+        with app.app_context():
+            rebuild_show_counts(datetime(2046, 1, 1))
+            db.session.commit()
+        self.assertEqual(self.get_counts(14), (1, 0))
+
+    def test_edit_keeps_unrendered_columns(self):
+        with app.app_context():
+            image_link = db.session.get(Venue, 15).image_link
+        self.assertTrue(image_link)
+
+        self.client().post('/venues/15/edit', data={'name': 'Edited Venue', 'city': 'City 1', 'state': 'CA',
+            'address': '1 Main St', 'genres': 'Jazz'})
+        with app.app_context():
+            venue = db.session.get(Venue, 15)
+            self.assertEqual(venue.name, 'Edited Venue')
+            self.assertEqual(venue.image_link, image_link)
+
+    def test_create_upsert_keeps_unrendered_columns(self):
+        with app.app_context():
+            venue = db.session.get(Venue, 16)
+            name, image_link = venue.name, venue.image_link
+        self.assertTrue(image_link)
+
+        self.client().post('/venues/create', data={'name': name, 'city': 'City 2', 'state': 'CA',
+            'address': '2 Main St', 'genres': 'Jazz'})
+        with app.app_context():
+            venue = db.session.get(Venue, 16)
+            self.assertEqual(venue.address, '2 Main St')
+            self.assertEqual(venue.image_link, image_link)
+
+    def test_api_etag_changes_on_delete(self):
+        client = self.client()
+        client.post('/artists/create', data={'name': 'Deleted Artist', 'city': 'City 1', 'state': 'CA', 'genres': 'Jazz'})
+        with app.app_context():
+            artist_id = db.session.query(Artist.id).filter(Artist.name == 'Deleted Artist').scalar()
+
+        res = client.get('/api/v1/artists?per_page=200')
+        etag = res.headers['ETag']
+        self.assertNotIn('Last-Modified', res.headers)
+        self.assertEqual(client.get('/api/v1/artists?per_page=200', headers={'If-None-Match': etag}).status_code, 304)
+
+        client.delete('/artists/{}'.format(artist_id))
+        res = client.get('/api/v1/artists?per_page=200', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn(artist_id, [artist['id'] for artist in res.get_json()['artists']])
+
+    def test_export_unquotes_genres(self):
+        with app.app_context():
+            db.session.query(Artist).filter(Artist.id == 1).update({'genres': '{Jazz,"Rock n Roll"}'})
+            db.session.commit()
+
+        res = self.client().get('/api/v1/export/artists.jsonl')
+        artist = json.loads(res.get_data(as_text=True).splitlines()[0])
+        self.assertEqual(artist['genres'], ['Jazz', 'Rock n Roll'])
+
+    def test_api_etag_changes_on_write_outside_the_process(self):
+        # e.g. the refresh-show-counts command, which has its own cache
+        client = self.client()
+        etag = client.get('/api/v1/venues/1').headers['ETag']
+        self.assertEqual(client.get('/api/v1/venues/1', headers={'If-None-Match': etag}).status_code, 304)
+
+        with app.app_context():
+            refresh_show_counts()
+            db.session.commit()
+        self.assertEqual(client.get('/api/v1/venues/1', headers={'If-None-Match': etag}).status_code, 200)
+        self.assertEqual(client.get('/api/v1/venues/100500').status_code, 404)
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Checks the instrumentation served at /metrics"""
+
+    def test_failed_query_stops_timer(self):
+        with app.app_context():
+            connection = db.session.connection()
+            with self.assertRaises(Exception):
+                connection.execute(text('SELECT * FROM no_such_table'))
+            self.assertEqual(connection.info.get('query_start'), [])
+            db.session.rollback()
+
+    def test_cache_counters(self):
+        cache.get_or_set('metrics-test', lambda: 'value')
+        cache.get_or_set('metrics-test', lambda: 'value')
+        stats = cache.stats()
+
+        body = app.test_client().get('/metrics').get_data(as_text=True)
+        self.assertIn('# TYPE fyyur_cache_hits_total counter', body)
+        self.assertIn('fyyur_cache_hits_total {}'.format(stats['hits']), body)
+        self.assertIn('fyyur_cache_misses_total {}'.format(stats['misses']), body)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#----------------------------------------------------------------------------#
+# Write helpers.
+#
+# Used by the create and edit handlers in app.py: venues and artists are
+# written with a single INSERT ... ON CONFLICT (name) DO UPDATE (or UPDATE
+# by id) instead of loading the record first, and integrity errors raised by
+# the database are turned into messages naming the offending field.
+#----------------------------------------------------------------------------#
+
+import re
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+class Conflict(Exception):
+  '''
+  Conflict(message)
+      raised by a write that would contradict existing records, e.g. a
+      double booking; message is shown to the user
+  '''
+
+
+def upsert(session, model, values):
+  '''
+  upsert(session, model, values)
+      inserts values into model's table, or updates the record with the same
+      (unique) name, and returns the record's id
+  '''
+  dialect = session.connection().dialect.name
+  insert = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(model.__table__).values(values)
+
+  changes = {key: insert.excluded[key] for key in values if key != 'name'}
+  statement = insert.on_conflict_do_update(index_elements=[model.__table__.c.name], set_=changes)
+
+  if dialect == 'postgresql':
+    return session.execute(statement.returning(model.id)).scalar()
+  # SQLAlchemy 1.4 has no RETURNING for SQLite, so the id costs a second query
+  session.execute(statement)
+  return session.query(model.id).filter(model.name == values['name']).scalar()
+
+
+def update(session, model, id, values):
+  '''
+  update(session, model, id, values)
+      updates the record with the given id without loading it, and returns
+      whether it exists
+  '''
+  return session.query(model).filter(model.id == id).update(values, synchronize_session=False) > 0
+
+
+# (pattern, message) pairs matched against Postgres and SQLite error messages
+INTEGRITY_ERRORS = [
+  (r'unique constraint "\w+_name_key"|UNIQUE constraint failed: \w+\.name', '{name} is already listed.'),
+  (r'Key \((?P<column>\w+)_id\)=\(\d+\) is not present', 'There is no {column} with this ID.'),
+  (r'FOREIGN KEY constraint failed', 'There is no artist or venue with this ID.'),
+  (r'null value in column "(?P<column>\w+)"|NOT NULL constraint failed: \w+\.(?P<sqlite_column>\w+)', '{column} is required.'),
+]
+
+
+def integrity_message(error, values):
+  '''
+  integrity_message(error, values)
+      returns a message describing the constraint violated by an
+      IntegrityError raised while writing values
+  '''
+  for pattern, message in INTEGRITY_ERRORS:
+    match = re.search(pattern, str(error.orig))
+    if match:
+      groups = match.groupdict()
+      column = groups.get('column') or groups.get('sqlite_column') or ''
+      message = message.format(name=values.get('name'), column=column.replace('_', ' '))
+      return message[:1].upper() + message[1:]
+  return 'The record conflicts with an existing one.'
@@ -0,0 +1,71 @@
+#----------------------------------------------------------------------------#
+# Shared helpers for the Trivia benchmarks.
+#
+# Run a benchmark from the backend folder, e.g. "python -m benchmarks.quiz".
+# Benchmarks use a throwaway SQLite database unless BENCHMARK_DATABASE_URL
+# points at another (e.g. Postgres) database.
+#----------------------------------------------------------------------------#
+
+import os
+import random
+import tempfile
+import time
+
+from flaskr import create_app
+from models import db, Question, Category
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+
+
+def setup_app():
+  '''
+  setup_app()
+      returns the app bound to the benchmark database, with a fresh schema
+  '''
+  url = os.environ.get('BENCHMARK_DATABASE_URL')
+  if url is None:
+    url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'trivia_benchmark.db')
+  app = create_app('TEST', url)
+
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+  return app
+
+
+def seed(app, questions=1000000, batch_size=10000):
+  '''
+  seed(app, questions)
+      bulk inserts the categories and synthetic questions spread over them
+  '''
+  rnd = random.Random(42)
+
+  with app.app_context():
+    db.session.execute(Category.__table__.insert(),
+      [{'id': id, 'type': type} for id, type in enumerate(CATEGORIES, 1)])
+
+    for start in range(1, questions + 1, batch_size):
+      db.session.execute(Question.__table__.insert(), [{
+        'id': i,
+        'question': 'Question {} about {}?'.format(i, rnd.choice(CATEGORIES).lower()),
+        'answer': 'Answer {}'.format(i),
+        'category': str(rnd.randint(1, len(CATEGORIES))),
+        'difficulty': rnd.randint(1, 5)
+      } for i in range(start, min(start + batch_size, questions + 1))])
+    db.session.commit()
+
+
+def measure(label, func, duration=2):
+  '''
+  measure(label, func, duration=2)
+      runs func repeatedly for about duration seconds and prints the calls
+      per second
+  '''
+  calls = 0
+  start = time.perf_counter()
+  while time.perf_counter() - start < duration:
+    func()
+    calls += 1
+
+  elapsed = time.perf_counter() - start
+  print('{:<50} {:>10.1f} /s {:>10.2f} ms'.format(label, calls / elapsed, elapsed / calls * 1000))
@@ -0,0 +1,40 @@
+#----------------------------------------------------------------------------#
+# Quiz turns: ORDER BY random() vs. seeking to a random id, with the
+# previous questions sent by the client or kept in a quiz session.
+#
+#   python -m benchmarks.quiz [questions] [previous_questions]
+#----------------------------------------------------------------------------#
+
+import random
+import sys
+from sqlalchemy.sql.expression import func
+
+from models import Question
+from benchmarks import setup_app, seed, measure
+
+
+def main(questions=1000000, previous=500):
+  app = setup_app()
+  seed(app, questions)
+  client = app.test_client()
+
+  with app.app_context():
+    science = [id for id, in Question.query.filter(Question.category == '1').with_entities(Question.id)]
+  previous_questions = random.Random(42).sample(science, previous)
+  body = {'previous_questions': previous_questions, 'quiz_category': {'id': '1', 'type': 'Science'}}
+
+  def random_order():
+    with app.app_context():
+      Question.query.filter(Question.category == '1', Question.id.notin_(previous_questions)) \
+        .order_by(func.random()).limit(1).all()
+
+  print('{} questions, {} previous questions'.format(questions, previous))
+  measure('ORDER BY random() LIMIT 1', random_order)
+  measure('POST /quizzes (previous_questions)', lambda: client.post('/quizzes', json=body))
+
+  session_id = client.post('/quizzes', json=body).get_json()['session_id']
+  measure('POST /quizzes (session_id)', lambda: client.post('/quizzes', json={'session_id': session_id}))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:]])
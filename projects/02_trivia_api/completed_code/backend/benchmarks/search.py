@@ -0,0 +1,35 @@
+#----------------------------------------------------------------------------#
+# Question search: every ILIKE match formatted vs. a ranked page of matches.
+#
+#   python -m benchmarks.search [questions]
+#
+# On SQLite both read every question; run it against Postgres (see
+# BENCHMARK_DATABASE_URL) to measure the full-text index.
+#----------------------------------------------------------------------------#
+
+import sys
+
+from models import Question
+from benchmarks import setup_app, seed, measure
+
+SEARCH_TERMS = ['question 12345?', 'about art', 'answer 99']
+
+
+def main(questions=1000000):
+  app = setup_app()
+  seed(app, questions)
+  client = app.test_client()
+
+  print('{} questions'.format(questions))
+  for search_term in SEARCH_TERMS:
+    def unindexed():
+      with app.app_context():
+        [question.format() for question in Question.query.filter(Question.question.ilike('%{}%'.format(search_term))).all()]
+
+    measure('ILIKE, all matches: {}'.format(search_term), unindexed)
+    measure('POST /questions/search: {}'.format(search_term),
+      lambda: client.post('/questions/search', json={'searchTerm': search_term}))
+
+
+if __name__ == '__main__':
+  main(*[int(arg) for arg in sys.argv[1:]])
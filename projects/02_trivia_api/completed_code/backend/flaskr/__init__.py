@@ -2,20 +2,32 @@ import sys
 sys.path.insert(0, '..')
 
 from flask import Flask, request, abort, jsonify
-from sqlalchemy.sql.expression import func
+from sqlalchemy.sql.expression import func, literal_column
 from flask_cors import CORS
 import json
+import random
+import re
 
-from models import setup_db, Question, Category
+from models import setup_db, database_path, db, category_cache, search_document, Question
+from quiz_sessions import QuizSessions
 
 QUESTIONS_PER_PAGE = 10
-
-def create_app(env='PROD'):
+# above this many matching questions, total_questions is the planner's estimate
+EXACT_COUNT_LIMIT = 100000
+# quiz sessions expire after an hour without a turn
+QUIZ_SESSION_TTL = 3600
+MAX_QUIZ_SESSIONS = 10000
+# random ids probed for an unseen question before a turn picks among the
+# unseen questions in SQL
+QUIZ_PROBES = 8
+
+def create_app(env='PROD', database_path=database_path):
   # create and configure the app
   app = Flask(__name__)
-  setup_db(app, env)
+  setup_db(app, env, database_path)
 
   CORS(app, resources={r"/*": {"origins": "*"}})
+  quiz_sessions = QuizSessions(QUIZ_SESSION_TTL, MAX_QUIZ_SESSIONS)
 
   @app.after_request
   def after_request(response):
@@ -25,18 +37,20 @@ def create_app(env='PROD'):
 
   @app.route('/categories', methods=['GET'])
   def get_categories():
-    categories = Category.query.order_by(Category.id).all()
+    categories, etag = category_cache.get()
 
-    return jsonify({
+    response = jsonify({
       'success': True,
-      'categories': {category.id: category.type for category in categories}
+      'categories': categories
     })
+    # clients sending If-None-Match get a 304 while categories are unchanged
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
   @app.route('/questions', methods=['GET'])
   def get_questions():
-    questions = Question.query.order_by(Question.id).all()
-    current_questions = paginate_questions(request, questions)
-    categories = Category.query.order_by(Category.id).all()
+    current_questions, next_cursor = paginate_questions(request, Question.query)
+    categories, etag = category_cache.get()
 
     if len(current_questions) == 0:
       abort(404)
@@ -44,20 +58,53 @@ def create_app(env='PROD'):
     return jsonify({
       'success': True,
       'questions': current_questions,
-      'total_questions': len(questions),
+      'total_questions': count_questions(Question.query),
+      'next_cursor': next_cursor,
       'current_category': None,
-      'categories': {category.id: category.type for category in categories}
+      'categories': categories
     })
 
-  def paginate_questions(request, questions):
+  def paginate_questions(request, query):
+    '''
+    paginate_questions(request, query)
+        returns one page of the questions of query and the cursor of the next
+        page (None on the last one); ?cursor=<last id seen> reads the page
+        from the index without skipping the earlier ones, as ?page=<n> does
+    '''
+    query = query.order_by(Question.id)
+    cursor = request.args.get('cursor', None, type=int)
     page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
-
-    questions = [question.format() for question in questions]
-    current_questions = questions[start:end]
 
-    return current_questions
+    if cursor is not None:
+      query = query.filter(Question.id > cursor)
+    elif page > 0:
+      query = query.offset((page - 1) * QUESTIONS_PER_PAGE)
+    else:
+      return [], None
+
+    # one question more than a page tells whether there is a next one
+    questions = [question.format() for question in query.limit(QUESTIONS_PER_PAGE + 1).all()]
+    next_cursor = questions[QUESTIONS_PER_PAGE - 1]['id'] if len(questions) > QUESTIONS_PER_PAGE else None
+
+    return questions[:QUESTIONS_PER_PAGE], next_cursor
+
+  def count_questions(query):
+    '''
+    count_questions(query)
+        returns the number of questions of query; counting reads every one of
+        them, so on Postgres large results are estimated by the planner
+    '''
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+      # run as plain driver SQL with the statement's own parameters, so that
+      # neither the values nor text like ":word" in them are parsed again
+      statement = query.statement.compile(dialect=connection.dialect)
+      plan = connection.execute('EXPLAIN (FORMAT JSON) ' + str(statement), statement.params).scalar()
+      estimate = int(plan[0]['Plan']['Plan Rows'])
+      if estimate > EXACT_COUNT_LIMIT:
+        return estimate
+
+    return query.order_by(None).with_entities(func.count(Question.id)).scalar()
 
   @app.route('/questions/<id>', methods=['DELETE'])
   def delete_question(id):
@@ -72,7 +119,7 @@ def create_app(env='PROD'):
       return jsonify({
         'success': True,
         'deleted': id,
-        'total_questions': len(Question.query.all())
+        'total_questions': count_questions(Question.query)
       })
 
     except Exception as e:
@@ -97,7 +144,7 @@ def create_app(env='PROD'):
       return jsonify({
         'success': True,
         'created': question.id,
-        'total_questions': len(Question.query.all())
+        'total_questions': count_questions(Question.query)
       })
 
     except:
@@ -107,46 +154,129 @@ def create_app(env='PROD'):
   def get_questions_by_search_term():
     body = request.get_json()
     search_term = body.get('searchTerm', None)
+    category_id = body.get('category', None)
+    page = body.get('page', 1)
+
+    if not isinstance(search_term, str) or not isinstance(page, int) or page < 1:
+      abort(422)
+    if category_id is not None:
+      # an id of a listed category, sent as a number or a string
+      categories, etag = category_cache.get()
+      category_id = str(category_id)
+      if not category_id.isdigit() or int(category_id) not in categories:
+        abort(422)
 
-    questions = Question.query.filter(Question.question.ilike('%{}%'.format(search_term.lower()))).all()
+    questions = search_questions(search_term, category_id)
+    current_questions = questions.offset((page - 1) * QUESTIONS_PER_PAGE).limit(QUESTIONS_PER_PAGE).all()
 
     return jsonify({
       'success': True,
-      'questions': [question.format() for question in questions],
-      'total_questions': len(questions),
-      'current_category': None
+      'questions': [question.format() for question in current_questions],
+      'total_questions': count_questions(questions),
+      'current_category': category_id
     })
 
+  def search_questions(search_term, category_id=None):
+    '''
+    search_questions(search_term, category_id=None)
+        returns a query of the questions whose question or answer text
+        contains search_term, best matches first: matches in the question
+        before those only in the answer, then by full-text rank (on
+        Postgres) and shorter questions first; on Postgres the term must
+        also start a word, so that the full-text index finds the matches
+        without reading every question
+    '''
+    pattern = '%{}%'.format(search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+    in_question = Question.question.ilike(pattern, escape='\\')
+
+    query = Question.query.filter(in_question | Question.answer.ilike(pattern, escape='\\'))
+    if category_id is not None:
+      query = query.filter(Question.category == category_id)
+
+    ranking = [in_question.desc()]
+    words = re.findall(r'[^\W_]+', search_term.lower())
+    if words and db.session.connection().dialect.name == 'postgresql':
+      document = search_document()
+      tsquery = func.to_tsquery(literal_column("'simple'"), ' & '.join(word + ':*' for word in words))
+      query = query.filter(document.op('@@')(tsquery))
+      ranking.append(func.ts_rank(document, tsquery).desc())
+
+    return query.order_by(*ranking, func.length(Question.question), Question.id)
+
   @app.route('/categories/<id>/questions', methods=['GET'])
   def get_questions_by_category(id):
-    questions = Question.query.filter(Question.category == id).all()
-    current_questions = paginate_questions(request, questions)
+    questions = Question.query.filter(Question.category == id)
+    current_questions, next_cursor = paginate_questions(request, questions)
 
     return jsonify({
       'success': True,
       'questions': current_questions,
-      'total_questions': len(questions),
+      'total_questions': count_questions(questions),
+      'next_cursor': next_cursor,
       'current_category': id
     })
 
   @app.route('/quizzes', methods=['POST'])
   def get_quizz_question():
     body = request.get_json()
+    session_id = body.get('session_id', None)
 
-    previous_questions = body.get('previous_questions', None)
-    quiz_category = body.get('quiz_category', None)
-
-    if quiz_category.get('id') == 0:
-      questions = Question.query.filter(Question.id.notin_(previous_questions)).order_by(func.random()).limit(1).all()
+    if session_id is None:
+      # the first turn starts a session, later turns only send its id
+      previous_questions = body.get('previous_questions', None)
+      quiz_category = body.get('quiz_category', None)
+      session_id, session = quiz_sessions.start(quiz_category.get('id'), previous_questions or [])
     else:
-      questions = Question.query.filter(Question.category == quiz_category.get('id'), Question.id.notin_(previous_questions)).order_by(func.random()).limit(1).all()
-    questions = [question.format() for question in questions]
+      session = quiz_sessions.get(session_id)
+      if session is None:
+        abort(404)
+
+    question = pick_question(session.category_id, session)
+    if question:
+      session.add(question.id)
 
     return jsonify({
       'success': True,
-      'question': questions[0] if len(questions) > 0 else None
+      'session_id': session_id,
+      'question': question.format() if question else None
     })
 
+  def pick_question(category_id, seen):
+    '''
+    pick_question(category_id, seen)
+        returns a random question of the category (of any category for id 0)
+        whose id is not in seen, or None; instead of sorting every question
+        by random(), it seeks to a random id between the lowest and highest of
+        the category and takes the question there, probing again when that
+        one was seen, so a turn costs O(log n) while most of the category is
+        unseen
+    '''
+    query = Question.query
+    if category_id != 0:
+      query = query.filter(Question.category == category_id)
+
+    # separate subqueries, so that each of them is a single index lookup
+    lowest, highest = db.session.query(query.with_entities(func.min(Question.id)).as_scalar(),
+      query.with_entities(func.max(Question.id)).as_scalar()).one()
+    if lowest is None:
+      return None
+
+    # a question is picked in proportion to the gap in the ids before it
+    # (deleted questions, questions of other categories); seen questions are
+    # probed again rather than skipped, so they do not widen the gaps
+    for probe in range(QUIZ_PROBES):
+      question = query.filter(Question.id >= random.randint(lowest, highest)).order_by(Question.id).first()
+      if question.id not in seen:
+        return question
+
+    # most of the category has been seen: pick evenly among the rest
+    if len(seen):
+      query = query.filter(Question.id.notin_(list(seen)))
+    unseen = query.with_entities(func.count(Question.id)).scalar()
+    if unseen == 0:
+      return None
+    return query.order_by(Question.id).offset(random.randrange(unseen)).first()
+
   @app.errorhandler(404)
   def not_found(error):
     return jsonify({
@@ -1,4 +1,9 @@
-from sqlalchemy import Column, String, Integer
+import hashlib
+import json
+import time
+from threading import Lock
+from sqlalchemy import Column, String, Integer, Index, DDL, event, func, literal_column
+from sqlalchemy.orm import Session
 from flask_sqlalchemy import SQLAlchemy
 
 database_name = "trivia"
@@ -35,6 +40,10 @@ Question
 '''
 class Question(db.Model):  
   __tablename__ = 'questions'
+  __table_args__ = (
+    # serves the pages of /categories/<id>/questions
+    Index('ix_questions_category_id', 'category', 'id'),
+  )
 
   id = Column(Integer, primary_key=True)
   question = Column(String)
@@ -68,6 +77,21 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+'''
+search_document()
+    the full-text document of a question searched by /questions/search;
+    must stay in sync with the expression of ix_questions_search
+'''
+def search_document():
+  text = func.coalesce(Question.question, literal_column("''")) + literal_column("' '") \
+    + func.coalesce(Question.answer, literal_column("''"))
+  return func.to_tsvector(literal_column("'simple'"), text)
+
+# Postgres only, and part of trivia.psql for restored databases
+event.listen(Question.__table__, 'after_create', DDL(
+  "CREATE INDEX ix_questions_search ON questions USING gin "
+  "(to_tsvector('simple', coalesce(question, '') || ' ' || coalesce(answer, '')))").execute_if(dialect='postgresql'))
+
 '''
 Category
 
@@ -85,4 +109,55 @@ class Category(db.Model):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+'''
+CategoryCache(ttl)
+    the {id: type} map of the categories and its ETag, loaded on first use
+    and kept until invalidate() is called, which happens when a transaction
+    writing categories commits; the ttl bounds how long changes made by
+    other processes or outside the ORM go unnoticed
+'''
+class CategoryCache:
+  def __init__(self, ttl=300):
+    self.ttl = ttl
+    self.lock = Lock()
+    self.generation = 0
+    # (categories, etag, expiry time)
+    self.cached = None
+
+  def get(self):
+    cached = self.cached
+    if cached is None or cached[2] < time.monotonic():
+      generation = self.generation
+      categories = {category.id: category.type for category in Category.query.order_by(Category.id)}
+      etag = hashlib.sha1(json.dumps(categories).encode()).hexdigest()
+      cached = (categories, etag, time.monotonic() + self.ttl)
+
+      with self.lock:
+        # a map loaded while categories changed may be stale already
+        if generation == self.generation:
+          self.cached = cached
+
+    return cached[0], cached[1]
+
+  def invalidate(self):
+    with self.lock:
+      self.generation += 1
+      self.cached = None
+
+category_cache = CategoryCache()
+
+@event.listens_for(Session, 'after_flush')
+def track_category_changes(session, flush_context):
+  if any(isinstance(instance, Category) for instance in session.new | session.dirty | session.deleted):
+    session.info['categories_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_categories(session):
+  if session.info.pop('categories_changed', False):
+    category_cache.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def discard_category_changes(session):
+  session.info.pop('categories_changed', None)
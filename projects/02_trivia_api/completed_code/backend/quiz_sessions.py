@@ -0,0 +1,78 @@
+import secrets
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from threading import Lock
+
+'''
+QuizSession
+    the category of a quiz and the ids of the questions it has shown, kept
+    sorted in an array of machine integers (8 bytes per question)
+'''
+class QuizSession:
+  def __init__(self, category_id, seen=()):
+    self.category_id = category_id
+    self.seen = array('q', sorted(set(seen)))
+
+  def __contains__(self, id):
+    i = bisect_left(self.seen, id)
+    return i < len(self.seen) and self.seen[i] == id
+
+  def __iter__(self):
+    return iter(self.seen)
+
+  def __len__(self):
+    return len(self.seen)
+
+  def add(self, id):
+    if id not in self:
+      insort(self.seen, id)
+
+'''
+QuizSessions(ttl, max_sessions)
+    the quiz sessions of this process by session id; a session expires ttl
+    seconds after its last turn, and the least recently played sessions are
+    dropped beyond max_sessions
+'''
+class QuizSessions:
+  def __init__(self, ttl=3600, max_sessions=10000):
+    self.ttl = ttl
+    self.max_sessions = max_sessions
+    self.lock = Lock()
+    # session id: (session, expiry time), least recently played first
+    self.sessions = OrderedDict()
+
+  def start(self, category_id, seen=()):
+    session_id = secrets.token_urlsafe(16)
+    session = QuizSession(category_id, seen)
+
+    with self.lock:
+      self.evict()
+      self.sessions[session_id] = (session, time.monotonic() + self.ttl)
+      while len(self.sessions) > self.max_sessions:
+        self.sessions.popitem(last=False)
+
+    return session_id, session
+
+  def get(self, session_id):
+    with self.lock:
+      self.evict()
+      if session_id not in self.sessions:
+        return None
+
+      session, expires = self.sessions.pop(session_id)
+      self.sessions[session_id] = (session, time.monotonic() + self.ttl)
+      return session
+
+  def evict(self):
+    # sessions are ordered by expiry, so the expired ones are at the front
+    now = time.monotonic()
+    while self.sessions:
+      session_id, (session, expires) = next(iter(self.sessions.items()))
+      if expires > now:
+        break
+      del self.sessions[session_id]
+
+  def __len__(self):
+    return len(self.sessions)
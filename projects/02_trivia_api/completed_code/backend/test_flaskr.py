@@ -69,6 +69,13 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['categories'])
         self.assertTrue(len(data['categories']))
 
+    def test_get_categories_not_modified(self):
+        etag = self.client().get('/categories').headers['ETag']
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.headers['ETag'], etag)
+
     def test_get_questions(self):
         res = self.client().get('/questions')
         data = json.loads(res.data)
@@ -89,6 +96,30 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertEqual(len(data['questions']), 10)
 
+    def test_get_questions_by_cursor(self):
+        res = self.client().get('/questions?page=1')
+        next_cursor = json.loads(res.data)['next_cursor']
+        res = self.client().get('/questions?cursor={}'.format(next_cursor))
+        data = json.loads(res.data)
+        second_page = json.loads(self.client().get('/questions?page=2').data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['questions'])
+        self.assertTrue(all(question['id'] > next_cursor for question in data['questions']))
+        self.assertEqual(data['questions'], second_page['questions'])
+
+    def test_get_questions_full_last_page(self):
+        with self.app.app_context():
+            ids = [id for id, in Question.query.with_entities(Question.id).order_by(Question.id)]
+        # exactly one page of questions is left after this cursor
+        res = self.client().get('/questions?cursor={}'.format(ids[-11]))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 10)
+        self.assertIsNone(data['next_cursor'])
+
     def test_404_page_not_found(self):
         page = self.client().get('/questions?page=100500')
         data = json.loads(page.data)
@@ -153,6 +184,51 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['total_questions'], 2)
         self.assertEqual(data['current_category'], None)
 
+    def test_get_questions_by_search_term_in_category(self):
+        res = self.client().post('/questions/search', json={'searchTerm': 'what', 'category': '4'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['questions'])
+        self.assertTrue(all(question['category'] == 4 for question in data['questions']))
+        self.assertEqual(data['total_questions'], len(data['questions']))
+        self.assertEqual(data['current_category'], '4')
+
+    def test_get_questions_by_search_term_in_category_id(self):
+        res = self.client().post('/questions/search', json={'searchTerm': 'what', 'category': 4})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(all(question['category'] == 4 for question in data['questions']))
+        self.assertEqual(data['current_category'], '4')
+
+    def test_422_search_category_unknown(self):
+        for category in ['history', 100500, [4]]:
+            res = self.client().post('/questions/search', json={'searchTerm': 'what', 'category': category})
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 422)
+            self.assertEqual(data['success'], False)
+            self.assertEqual(data['message'], 'unprocessable')
+
+    def test_422_search_term_missing(self):
+        res = self.client().post('/questions/search', json={})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'unprocessable')
+
+    def test_get_questions_by_search_term_with_colon(self):
+        res = self.client().post('/questions/search', json={'searchTerm': 'study of :what'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['total_questions'], 0)
+
     def test_get_questions_by_search_term_not_found(self):
         res = self.client().post('/questions/search', json={'searchTerm': 'one upon a time'})
         data = json.loads(res.data)
@@ -196,6 +272,57 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['question'])
         self.assertEqual(data['question'], self.quizz_question_output)
 
+    def test_get_quizz_question_by_session(self):
+        res = self.client().post('/quizzes', json=self.quizz_previous_questions_part)
+        session_id = json.loads(res.data)['session_id']
+        res = self.client().post('/quizzes', json={'session_id': session_id})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['session_id'], session_id)
+        self.assertFalse(data['question'])
+
+    def test_404_quizz_session_not_found(self):
+        res = self.client().post('/quizzes', json={'session_id': 'expired'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'Not found')
+
+    def test_get_quizz_question_after_session_lost(self):
+        res = self.client().post('/quizzes', json=self.quizz_previous_questions_part)
+        session_id = json.loads(res.data)['session_id']
+
+        # another server process does not know the session, so the client
+        # starts a new one from the questions shown so far
+        other_app = create_app()
+        setup_db(app=other_app, env='TEST', database_path=self.database_path)
+        client = other_app.test_client()
+        res = client.post('/quizzes', json={'session_id': session_id})
+        self.assertEqual(res.status_code, 404)
+
+        res = client.post('/quizzes', json=self.quizz_previous_questions_all)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(data['session_id'], session_id)
+        self.assertFalse(data['question'])
+
+    def test_get_quizz_question_plays_whole_category(self):
+        res = self.client().post('/quizzes', json={'previous_questions': [], 'quiz_category': {'id': '1', 'type': 'Science'}})
+        data = json.loads(res.data)
+        played = []
+        while data['question']:
+            played.append(data['question']['id'])
+            res = self.client().post('/quizzes', json={'session_id': data['session_id']})
+            data = json.loads(res.data)
+
+        with self.app.app_context():
+            category = [question.id for question in Question.query.filter(Question.category == '1')]
+        self.assertEqual(sorted(played), sorted(category))
+
     def test_get_quizz_question_not_found(self):
         res = self.client().post('/quizzes', json=self.quizz_previous_questions_all)
         data = json.loads(res.data)
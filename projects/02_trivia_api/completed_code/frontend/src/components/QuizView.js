@@ -10,6 +10,7 @@ class QuizView extends Component {
     super();
     this.state = {
         quizCategory: null,
+        sessionId: null,
         previousQuestions: [], 
         showAnswer: false,
         categories: {},
@@ -46,13 +47,18 @@ class QuizView extends Component {
   getNextQuestion = () => {
     const previousQuestions = [...this.state.previousQuestions]
     if(this.state.currentQuestion.id) { previousQuestions.push(this.state.currentQuestion.id) }
+    this.requestQuestion(previousQuestions, this.state.sessionId)
+  }
 
+  requestQuestion = (previousQuestions, sessionId) => {
     $.ajax({
       url: '/quizzes',
       type: "POST",
       dataType: 'json',
       contentType: 'application/json',
-      data: JSON.stringify({
+      data: JSON.stringify(sessionId ? {
+        session_id: sessionId
+      } : {
         previous_questions: previousQuestions,
         quiz_category: this.state.quizCategory
       }),
@@ -62,6 +68,7 @@ class QuizView extends Component {
       crossDomain: true,
       success: (result) => {
         this.setState({
+          sessionId: result.session_id,
           showAnswer: false,
           previousQuestions: previousQuestions,
           currentQuestion: result.question,
@@ -71,6 +78,12 @@ class QuizView extends Component {
         return;
       },
       error: (error) => {
+        // the session expired or is kept by another server process: start
+        // a new one from the questions shown so far
+        if (sessionId && error.status === 404) {
+          this.requestQuestion(previousQuestions, null)
+          return;
+        }
         alert('Unable to load question. Please try your request again')
         return;
       }
@@ -90,6 +103,7 @@ class QuizView extends Component {
   restartGame = () => {
     this.setState({
       quizCategory: null,
+      sessionId: null,
       previousQuestions: [], 
       showAnswer: false,
       numCorrect: 0,